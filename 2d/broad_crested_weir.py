@@ -10,6 +10,10 @@ from proteus.mprans.SpatialTools import Tank2D
 from proteus.mprans import SpatialTools as st
 import proteus.TwoPhaseFlow.TwoPhaseFlowProblem as TpFlow
 from proteus.Gauges import PointGauges, LineIntegralGauges, LineGauges
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tools.mesh_cache import cached_mesh
 
 # *************************** #
 # ***** GENERAL OPTIONS ***** #
@@ -133,6 +137,7 @@ tank.BC['airvent'].v_diffusive.uOfXT = lambda x, t: 0.0
 domain.MeshOptions.he = opts.he
 st.assembleDomain(domain)
 domain.MeshOptions.triangleOptions = "VApq30Dena%8.8f" % ((opts.he ** 2)/2.0,)
+cached_mesh(domain, "mesh")
 
 # ****************************** #
 # ***** INITIAL CONDITIONS ***** #
@@ -7,6 +7,12 @@ from proteus.mprans import SpatialTools as st
 import proteus.TwoPhaseFlow.TwoPhaseFlowProblem as TpFlow
 from proteus.Gauges import PointGauges, LineIntegralGauges, LineGauges
 import numpy as np
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tools.signed_distance import WaterColumn, LevelSetIC, VOFIC
+from tools.mesh_cache import cached_mesh
+from tools.initial_conditions import tabulate
 
 
 # *************************** #
@@ -57,27 +63,7 @@ class zero(object):
 waterLine_y = 0.6
 waterLine_x = 1.2
 
-class PHI_IC:
-    def uOfXT(self, x, t):
-        phi_x = x[0] - waterLine_x
-        phi_y = x[1] - waterLine_y
-        if phi_x < 0.0:
-            if phi_y < 0.0:
-                return max(phi_x, phi_y)
-            else:
-                return phi_y
-        else:
-            if phi_y < 0.0:
-                return phi_x
-            else:
-                return (phi_x ** 2 + phi_y ** 2)**0.5
-
-class VF_IC:
-    def __init__(self):
-        self.phi = PHI_IC()
-    def uOfXT(self, x, t):
-        from proteus.ctransportCoefficients import smoothedHeaviside
-        return smoothedHeaviside(1.5*opts.he,self.phi.uOfXT(x,0.0))
+waterColumn = WaterColumn((waterLine_x, waterLine_y))
 
 #########################
 # ***** Numerics ****** #
@@ -89,6 +75,7 @@ nnx = int(tank_dim[0]/opts.he)+1
 domain.MeshOptions.he = opts.he
 st.assembleDomain(domain)
 domain.MeshOptions.triangleOptions = "VApq30Dena%8.8f" % ((opts.he ** 2)/2.0,)
+cached_mesh(domain, "mesh")
 
 ############################################
 # ***** Create myTwoPhaseFlowProblem ***** #
@@ -110,7 +97,9 @@ m = myTpFlowProblem.SystemPhysics.modelDict
 m['flow'].p.initialConditions['p'] = zero()
 m['flow'].p.initialConditions['u'] = zero()
 m['flow'].p.initialConditions['v'] = zero()
-m['vof'].p.initialConditions['vof'] = VF_IC()
-m['ncls'].p.initialConditions['phi'] = PHI_IC()
-m['rdls'].p.initialConditions['phid'] = PHI_IC()
+m['vof'].p.initialConditions['vof'] = VOFIC(waterColumn, eps=1.5*opts.he)
+m['ncls'].p.initialConditions['phi'] = LevelSetIC(waterColumn)
+m['rdls'].p.initialConditions['phid'] = LevelSetIC(waterColumn)
 m['mcorr'].p.initialConditions['phiCorr'] = zero()
+for model in m.values():
+    tabulate(model.p.initialConditions)
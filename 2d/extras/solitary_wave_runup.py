@@ -13,6 +13,10 @@ from proteus.Gauges import PointGauges, LineIntegralGauges, LineGauges
 from proteus import WaveTools as wt
 from proteus.ctransportCoefficients import smoothedHeaviside
 import math
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from tools.wave_kinematics import WaveKinematics
 # *************************** #
 # ***** GENERAL OPTIONS ***** #
 # *************************** #
@@ -60,6 +64,8 @@ if opts.waves is True:
 				trans = np.array([x0, 0., 0.]),
                        		fast = opts.fast
 			  )
+    # eta and u shared by the initial conditions at each point and time
+    kinematics = WaveKinematics(wave)
 
 # *************************** #
 # ***** DOMAIN AND MESH ***** #
@@ -120,28 +126,31 @@ class zero(object):
 
 class clsvof_init_cond(object):
     def uOfXT(self,x,t):
-        return x[1] - (wave.eta(x,0) + opts.wl)    
+        return x[1] - (kinematics.eta(x,0) + opts.wl)    
 
 epsFact_consrv_heaviside=3.0
 wavec =  np.sqrt(9.81 * (depth+opts.wave_height))
 
 def weight(x,t):
+    t = t%(toe/wavec)
     return 1.0-smoothedHeaviside(epsFact_consrv_heaviside*opts.he,
-                                 (x[1] - (max(wave.eta(x, t%(toe/wavec)),
-                                 wave.eta(x+toe, t%(toe/wavec)))
+                                 (x[1] - (max(kinematics.eta(x, t),
+                                 kinematics.eta(x+toe, t))
                                              +opts.wl)))
-        
+
 class vel_u(object):
     def uOfXT(self, x, t):
-        if x[1] <= wave.eta(x,t) + opts.wl:
-            return weight(x,t)*wave.u(x,t)[0]
+        eta, u = kinematics(x, t)
+        if x[1] <= eta + opts.wl:
+            return weight(x,t)*u[0]
         else:
             return 0.0
 
 class vel_v(object):
     def uOfXT(self, x, t):
-        if x[1] <= wave.eta(x,t) + opts.wl:
-            return weight(x,t)*wave.u(x,t)[1]
+        eta, u = kinematics(x, t)
+        if x[1] <= eta + opts.wl:
+            return weight(x,t)*u[1]
         else:
             return 0.0
 
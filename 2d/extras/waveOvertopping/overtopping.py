@@ -7,6 +7,11 @@ from proteus.mprans import BodyDynamics as bd
 from proteus.ctransportCoefficients import (smoothedHeaviside,
                                             smoothedHeaviside_integral)
 import proteus.TwoPhaseFlow.TwoPhaseFlowProblem as TpFlow
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from tools.wave_kinematics import WaveKinematics
+from tools.wave_synthesis import SpectralWaveKinematics, cached_sea_state, cached_wave
 from proteus import Gauges as ga
 
 
@@ -52,6 +57,7 @@ opts=Context.Options([
     ("Nfreq",32 , "Number of fourier components per window"),
     ("wave_length",5.,"used only define sponge length and tank dimensions"),
     ("RandomWaves",True,"random wave generation"),
+    ("fft_synthesis",False,"synthesise the random wave kinematics by inverse FFT instead of RandomWavesFast windows, checked against RandomWaves at the inlet"),
 
    # Numerical Options
     ("refinement_level", 150.,"he=wavelength/refinement_level"),
@@ -77,25 +83,33 @@ np.random.seed(opts.seed)
 if opts.RandomWaves==True:
     phi = 2*np.pi*np.random.rand(opts.N)
     Tend=opts.Ntotalwaves*opts.Tp/1.1
-    wave = wt.RandomWavesFast(Tstart=opts.Tstart,
-                              Tend=Tend,
-                              x0=opts.x0,
-                              Tp=opts.Tp,
-                              Hs=opts.Hs,
-                              mwl=opts.mwl,
-                              depth=opts.depth,
-                              waveDir=opts.waveDir,
-                              g=opts.g,
-                              N=opts.N,
-                              bandFactor=opts.bandFactor,
-                              spectName=opts.spectName,
-                              spectral_params=opts.spectral_params,
-                              phi=phi,
-                              Lgen=opts.Lgen,
-                              Nwaves=opts.Nwaves,
-                              Nfreq=opts.Nfreq,
-                              checkAcc=True,
-                              fast=True)
+    # the sea state, shared by the RandomWaves and RandomWavesFast paths
+    components = dict(Tp=opts.Tp,
+                      Hs=opts.Hs,
+                      mwl=opts.mwl,
+                      depth=opts.depth,
+                      waveDir=opts.waveDir,
+                      g=opts.g,
+                      N=opts.N,
+                      bandFactor=opts.bandFactor,
+                      spectName=opts.spectName,
+                      spectral_params=opts.spectral_params,
+                      phi=phi)
+    if opts.fft_synthesis:
+        # the components of the sea, shared by all ranks and runs through the cache
+        wave = cached_sea_state(wt.RandomWaves, **components)
+    else:
+        # the window decomposition, built once and shared through the cache
+        wave = cached_wave(wt.RandomWavesFast,
+                           Tstart=opts.Tstart,
+                           Tend=Tend,
+                           x0=opts.x0,
+                           Lgen=opts.Lgen,
+                           Nwaves=opts.Nwaves,
+                           Nfreq=opts.Nfreq,
+                           checkAcc=True,
+                           fast=True,
+                           **components)
     
     Duration=Tend
     wave_length=wave.wavelength
@@ -274,7 +288,14 @@ smoothing=ecH*he
 tank.BC['y+'].setAtmosphere()
 tank.BC['y-'].setFreeSlip()
 tank.BC['x+'].setFreeSlip()
-tank.BC['x-'].setUnsteadyTwoPhaseVelocityInlet(wave, smoothing=smoothing, vert_axis=1)
+# the inlet and the generation zone share one evaluation of the wave
+if opts.RandomWaves and opts.fft_synthesis:
+    # checked against the direct sum at construction; synthesis_benchmark.py
+    # compares it with RandomWavesFast
+    kinematics = SpectralWaveKinematics(wave)
+else:
+    kinematics = WaveKinematics(wave)
+tank.BC['x-'].setUnsteadyTwoPhaseVelocityInlet(kinematics, smoothing=smoothing, vert_axis=1)
 
 tank.BC['sponge'].setNonMaterial()
 for bc in obstacle.BC_list:
@@ -289,7 +310,7 @@ tank.setGenerationZones(flags=2,
                         epsFact_solid=wave_length/2.,
                         center=(-wave_length/2,0.35),
                         orientation=(1.,0.,0.),
-                        waves=wave,
+                        waves=kinematics,
                         dragAlpha=dragAlpha)
 
 tank.setAbsorptionZones(flags=3,
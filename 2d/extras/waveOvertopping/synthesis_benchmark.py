@@ -0,0 +1,47 @@
+"""
+Direct RandomWavesFast evaluation against the FFT synthesis of the same sea,
+with the default wave options of overtopping.py, at the points of the
+generation zone and the inlet:
+
+    python synthesis_benchmark.py [nPoints] [nTimes]
+"""
+import os
+import sys
+import numpy as np
+from proteus import WaveTools as wt
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from tools.wave_synthesis import SpectralWaveKinematics, benchmark_synthesis
+
+Tp = 2.326
+Hs = 0.1675
+mwl = depth = 0.4
+waveDir = np.array([1., 0., 0.])
+g = np.array([0., -9.805, 0.])
+N = 1000
+bandFactor = 2.0
+spectName = "JONSWAP"
+spectral_params = {"gamma": 3.3, "TMA": False, "depth": 0.4}
+
+if __name__ == '__main__':
+    nPoints = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    nTimes = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    np.random.seed(420)
+    phi = 2*np.pi*np.random.rand(N)
+    Tend = 500*Tp/1.1
+    fast = wt.RandomWavesFast(Tstart=0, Tend=Tend, x0=np.array([0., 0., 0.]), Tp=Tp, Hs=Hs, mwl=mwl,
+                              depth=depth, waveDir=waveDir, g=g, N=N, bandFactor=bandFactor,
+                              spectName=spectName, spectral_params=spectral_params, phi=phi,
+                              Lgen=None, Nwaves=15, Nfreq=32, checkAcc=True, fast=True)
+    kinematics = SpectralWaveKinematics(wt.RandomWaves(Tp=Tp, Hs=Hs, mwl=mwl, depth=depth, waveDir=waveDir,
+                                                       g=g, N=N, bandFactor=bandFactor, spectName=spectName,
+                                                       spectral_params=spectral_params, phi=phi))
+    # generation zone one wavelength long in front of the inlet at x = 0
+    random = np.random.RandomState(0)
+    X = np.zeros((nPoints, 3))
+    X[:, 0] = -fast.wavelength*random.rand(nPoints)
+    X[:, 1] = depth*random.rand(nPoints)
+    X[:nPoints//10, 0] = 0.0
+    times = Tend/2 + 0.01*np.arange(nTimes)
+    print("error of the FFT synthesis against the direct sum: {0:.2e}".format(kinematics.check(1.0)))
+    print("eta, u against RandomWavesFast at 20 points: {0:.2e}, {1:.2e}".format(*kinematics.compare(fast, X[:20], times[:20])))
+    benchmark_synthesis(fast, kinematics, X, times)
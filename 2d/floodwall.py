@@ -8,6 +8,12 @@ import math
 from proteus.ctransportCoefficients import smoothedHeaviside
 from proteus import WaveTools as wt
 from proteus.mprans import SpatialTools as st
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tools.signed_distance import WaterColumn, LevelSetIC, VOFIC
+from tools.mesh_cache import cached_mesh
+from tools.initial_conditions import tabulate
 
 # *************************** #
 # ***** GENERAL OPTIONS ***** #
@@ -121,7 +127,8 @@ domain.boundaryTags = boundaryTags
 domain.MeshOptions.he = opts.he
 st.assembleDomain(domain)
 triangleOptions = "VApq30Dena%8.8f" % ((opts.he**2)/2.0,)   
-domain.writePoly("mesh")
+domain.MeshOptions.triangleOptions = triangleOptions
+cached_mesh(domain, "mesh")
 
 # ****************************** #
 # ***** INITIAL CONDITIONS ***** #
@@ -130,28 +137,8 @@ class zero(object):
     def uOfXT(self,x,t):
         return 0.
 
-def signedDistance(x):
-    phi_x = x[0] - 2.15
-    phi_y = x[1] - waterLevel
-    if phi_x < 0.0:
-        if phi_y < 0.0:
-            return max(phi_x, phi_y)
-        else:
-            return phi_y
-    else:
-        if phi_y < 0.0:
-            return phi_x
-        else:
-            return (phi_x ** 2 + phi_y ** 2)**0.5
-
-class VF_IC:
-    def uOfXT(self, x, t):
-        return smoothedHeaviside(1.5*opts.he,signedDistance(x))
-
-class PHI_IC:
-    def uOfXT(self, x, t):
-        return signedDistance(x)
-    
+waterColumn = WaterColumn((2.15, waterLevel))
+
 ############################################
 # ***** Create myTwoPhaseFlowProblem ***** #
 ############################################
@@ -170,9 +157,11 @@ m = myTpFlowProblem.SystemPhysics.modelDict
 m['flow'].p.initialConditions['p'] = zero()
 m['flow'].p.initialConditions['u'] = zero()
 m['flow'].p.initialConditions['v'] = zero()
-m['vof'].p.initialConditions['vof'] = VF_IC()
-m['ncls'].p.initialConditions['phi'] = PHI_IC()
-m['rdls'].p.initialConditions['phid'] = PHI_IC()
+m['vof'].p.initialConditions['vof'] = VOFIC(waterColumn, eps=1.5*opts.he)
+m['ncls'].p.initialConditions['phi'] = LevelSetIC(waterColumn)
+m['rdls'].p.initialConditions['phid'] = LevelSetIC(waterColumn)
 m['mcorr'].p.initialConditions['phiCorr'] = zero()
+for model in m.values():
+    tabulate(model.p.initialConditions)
 
 
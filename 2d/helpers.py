@@ -1,102 +1,546 @@
 import matplotlib
 import os
+import shutil
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tools.archive import ArchiveReader, xdmf_times
 
-def CreateFig(dt_output,h5,output_png,sim_name,moving_mesh=False,streamlines=True,single_phase=False, turbulence=False):
-    from tables import  open_file
-    if "png/" in output_png:
-        os.makedirs("png",exist_ok=True)
-    archive = open_file(h5,'r')
+def _domain_outline(domain):
+    """Plain (picklable) copy of the PSLG outline used for plotting"""
+    import numpy as np
+    return {'vertices': [list(v) for v in domain.vertices],
+            'segments': [list(s) for s in domain.segments],
+            'segmentFlags': [int(f) for f in domain.segmentFlags],
+            'L': np.array(domain.vertices).max(0),
+            'L_n': np.array(domain.vertices).min(0)}
+
+def _poly_outline(polyfile):
+    """Outline of a PSLG read back from its Triangle .poly file"""
+    import numpy as np
+    with open(polyfile) as f:
+        lines = [l.split('#')[0].split() for l in f]
+    lines = [l for l in lines if l]
+    nVertices, dim, nAttributes, nMarkers = [int(v) for v in lines[0][:4]]
+    index = {}
+    vertices = []
+    for l in lines[1:1+nVertices]:
+        index[int(l[0])] = len(vertices)
+        vertices.append([float(c) for c in l[1:1+dim]])
+    nSegments, nMarkers = [int(v) for v in lines[1+nVertices][:2]]
+    segments = []
+    segmentFlags = []
+    for l in lines[2+nVertices:2+nVertices+nSegments]:
+        segments.append([index[int(l[1])], index[int(l[2])]])
+        segmentFlags.append(int(l[3]) if nMarkers else 1)
+    return {'vertices': vertices,
+            'segments': segments,
+            'segmentFlags': segmentFlags,
+            'L': np.array(vertices).max(0),
+            'L_n': np.array(vertices).min(0)}
+
+def load_metadata(h5, sim_name=None, polyfile=None):
+    """
+    Output times and domain outline for h5 without importing the case.
+
+    The times come from the XDMF file next to the archive and the outline
+    from the .poly file written at mesh generation: polyfile, <h5 name>.poly,
+    mesh.poly next to the archive or sim_name.poly. A mesh.poly in the
+    current directory is not used, since every case writes one. Returns None
+    if either file can't be found.
+    """
+    xmf = os.path.splitext(h5)[0]+'.xmf'
+    candidates = [polyfile,
+                  os.path.splitext(h5)[0]+'.poly',
+                  os.path.join(os.path.dirname(h5),'mesh.poly'),
+                  sim_name and sim_name+'.poly']
+    polyfiles = [p for p in candidates if p and os.path.exists(p)]
+    if not os.path.exists(xmf) or not polyfiles:
+        return None
+    return xdmf_times(xmf), _poly_outline(polyfiles[0])
+
+def _load_case(dt_output, sim_name):
+    """Output times and domain outline by running the case setup"""
     dambreak=__import__(sim_name)
-#    import dambreak
     dambreak.myTpFlowProblem.outputStepping.dt_output=dt_output
     dambreak.myTpFlowProblem.outputStepping.nDTout=None
     dambreak.myTpFlowProblem.outputStepping.setOutputStepping()
     dambreak.myTpFlowProblem.initializeAll()
-    import matplotlib.tri as mtri
+    return list(dambreak.myTpFlowProblem.so.tnList), _domain_outline(dambreak.domain)
+
+class TriMeshCache(object):
+    """
+    Triangulation, trifinder and streamline-grid interpolation weights for one mesh.
+
+    The weights are the barycentric coordinates of the xg x yg grid points
+    stored as a sparse matrix, so interpolating a nodal field is a single
+    matrix-vector product. Grid points outside the mesh are masked, as with
+    matplotlib's LinearTriInterpolator.
+    """
+    def __init__(self, x, y, elements, xg, yg):
+        import numpy as np
+        self.elements = np.array(elements, dtype='i')
+        self.xg = xg
+        self.yg = yg
+        self.update_nodes(x, y)
+
+    def update_nodes(self, x, y):
+        """Rebuild the geometry for moved nodes, keeping the connectivity"""
+        import numpy as np
+        import matplotlib.tri as mtri
+        from scipy.sparse import csr_matrix
+        self.x = np.array(x)
+        self.y = np.array(y)
+        self.triang = mtri.Triangulation(self.x, self.y, self.elements)
+        self.trifinder = self.triang.get_trifinder()
+        xi, yi = np.meshgrid(self.xg, self.yg)
+        xi = xi.ravel()
+        yi = yi.ravel()
+        tri = self.trifinder(xi, yi)
+        inside = np.flatnonzero(tri >= 0)
+        nodes = self.elements[tri[inside]]
+        x0, x1, x2 = self.x[nodes[:,0]], self.x[nodes[:,1]], self.x[nodes[:,2]]
+        y0, y1, y2 = self.y[nodes[:,0]], self.y[nodes[:,1]], self.y[nodes[:,2]]
+        det = (y1 - y2)*(x0 - x2) + (x2 - x1)*(y0 - y2)
+        w0 = ((y1 - y2)*(xi[inside] - x2) + (x2 - x1)*(yi[inside] - y2))/det
+        w1 = ((y2 - y0)*(xi[inside] - x2) + (x0 - x2)*(yi[inside] - y2))/det
+        w2 = 1.0 - w0 - w1
+        self.weights = csr_matrix((np.concatenate((w0, w1, w2)),
+                                   (np.tile(inside, 3), nodes.T.ravel())),
+                                  shape=(xi.shape[0], self.x.shape[0]))
+        self.mask = (tri < 0).reshape(len(self.yg), len(self.xg))
+
+    def interpolate(self, values):
+        import numpy as np
+        return np.ma.masked_array((self.weights @ np.asarray(values)).reshape(self.mask.shape),
+                                  mask=self.mask)
+
+_mesh_caches = {}
+
+def _mesh_cache(h5, archive, L):
+    """TriMeshCache for the initial mesh of h5, shared by later calls in this process"""
+    import numpy as np
+    key = (os.path.abspath(h5), os.path.getmtime(h5), tuple(L[:2]))
+    if key not in _mesh_caches:
+        nodes = archive.nodes(0)
+        _mesh_caches[key] = TriMeshCache(nodes[:,0], nodes[:,1], archive.elements(0),
+                                         np.linspace(0, L[0], 20),
+                                         np.linspace(0, L[1], 20))
+    return _mesh_caches[key]
+
+def _render_frames(h5, output_png, frames, tnList, outline,
+                   moving_mesh=False, streamlines=True, single_phase=False, turbulence=False,
+                   raw=False, cache_dir=None, blit=False):
+    """
+    Draw the given output steps of h5. Writes output_png+'phi%04d.png' for
+    each step, or with raw=True returns a list of (width, height, rgba bytes)
+    with the same pixels instead. PNG frames already in the FrameCache at
+    cache_dir are reused rather than drawn again; raw frames are always
+    drawn, so the cache is not used with raw=True. With blit=True frames
+    are drawn by a BlitRenderer.
+    """
     from matplotlib import pyplot as  plt
     import numpy as np
-    domain = dambreak.domain
-#    domain.L = dambreak.tank_dim
-    domain.L=np.array(domain.vertices).max(0)
-    domain.L_n=np.array(domain.vertices).min(0)
-    domain.x = (0.,0.,0.)
-    nodes = archive.get_node("/nodesSpatial_Domain0")
-    x=nodes[:,0]
-    y=nodes[:,1]
-    elements = archive.get_node("/elementsSpatial_Domain0")
-    triang = mtri.Triangulation(x, y, elements)
-    xg = np.linspace(0, domain.L[0], 20)
-    yg = np.linspace(0, domain.L[1], 20)
-    xi, yi = np.meshgrid(xg,yg)
-#    plt.figure()
-
-    for it,t in enumerate(dambreak.myTpFlowProblem.so.tnList[:]):
-        plt.rcParams['figure.figsize'] = (10,5)
-        if moving_mesh:
-            nodes = archive.get_node("/nodesSpatial_Domain{0:d}".format(it))
-            x=nodes[:,0]
-            y=nodes[:,1]
-            elements = archive.get_node("/elementsSpatial_Domain{0:d}".format(it))
-            triang = mtri.Triangulation(x, y, elements)
-            xg = np.linspace(0, domain.L[0], 20)
-            yg = np.linspace(0, domain.L[1], 20)
-            xi, yi = np.meshgrid(xg,yg)
-        else:
-            pass
+    archive = ArchiveReader(h5)
+    L = outline['L']
+    L_n = outline['L_n']
+    vertices = outline['vertices']
+    mesh = _mesh_cache(h5, archive, L)
+    if moving_mesh:
+        # the connectivity is fixed, only the node coordinates change
+        mesh = TriMeshCache(mesh.x, mesh.y, mesh.elements, mesh.xg, mesh.yg)
+    buffers = []
+    renderer = None
+    colors = _segment_colors(outline['segmentFlags'])
+    plt.rcParams['figure.figsize'] = (10,5)
+    cache = FrameCache(cache_dir) if cache_dir and not raw else None
+    if cache is not None:
+        params = (moving_mesh, streamlines, single_phase, turbulence, blit,
+                  tuple(plt.rcParams['figure.figsize']), 200, plt.rcParams['image.cmap'],
+                  repr(outline['vertices']), repr(outline['segments']), repr(outline['segmentFlags']))
+        mesh_digest = FrameCache.digest(mesh.elements, mesh.x, mesh.y)
 
+    for it in frames:
+        t = tnList[it]
+        if moving_mesh:
+            nodes = archive.nodes(it)
         if single_phase:
-            kappa = archive.get_node("/kappa_t{0:d}".format(it))
+            kappa = archive.get('kappa', it)
         else:
-            phi = archive.get_node("/phi_t{0:d}".format(it))
-            vof = archive.get_node("/vof_t{0:d}".format(it))
-            wvof = np.ones(vof.shape,'d')
-            wvof -= vof
-        u = archive.get_node("/u_t{0:d}".format(it))
-        v = archive.get_node("/v_t{0:d}".format(it))
-        plt.clf()
-        plt.xlabel(r'z[m]')
-        plt.ylabel(r'x[m]')
-        colors = ['w','b', 'g','r','c','m','y','k']*(max(domain.segmentFlags)//8 + 1)
-#        plt.xlim(domain.x[0]-0.1*domain.L[0],domain.x[0]+domain.L[0]+0.1*domain.L[0])
-        plt.xlim(domain.L_n[0]-0.1*domain.L_n[0],domain.L[0]+0.1*domain.L[0])
-        plt.ylim(domain.L_n[1]-0.1*domain.L_n[1],domain.L[1]+0.1*domain.L[1])
-
+            phi = archive.get('phi', it)
+            vof = archive.get('vof', it)
+        u = archive.get('u', it)
+        v = archive.get('v', it)
+        if cache is not None:
+            data = (nodes,) if moving_mesh else ()
+            data += (kappa,) if single_phase else (phi, vof)
+            key = cache.key(it, t, params, mesh_digest, FrameCache.digest(u, v, *data))
+            cached = cache.get(key)
+            if cached is not None:
+                shutil.copyfile(cached, output_png+'phi{0:04d}.png'.format(it))
+                continue
         if moving_mesh:
-            pass
+            mesh.update_nodes(nodes[:,0], nodes[:,1])
+        fields = (mesh, u, v, None if single_phase else phi, None if single_phase else vof,
+                  kappa if single_phase else None, streamlines, single_phase, turbulence)
+        title = 'T={0:2.2f}'.format(t)
+        if blit:
+            if renderer is None:
+                renderer = BlitRenderer(outline, moving_mesh)
+            frame = renderer.render(lambda ax: _draw_fields(ax, *fields), title)
+            if raw:
+                buffers.append(frame)
+            else:
+                _write_png(output_png+'phi{0:04d}.png'.format(it), *frame)
         else:
-            for si,s in enumerate(domain.segments):
-                plt.plot([domain.vertices[s[0]][0],
-                          domain.vertices[s[1]][0]],
-                         [domain.vertices[s[0]][1],
-                          domain.vertices[s[1]][1]],
-                         color=colors[domain.segmentFlags[si]-1],
-                         linewidth=2,
-                         marker='o')
-        if single_phase:
-            if turbulence:
-                plt.tricontourf(x,y,elements,kappa)
+            plt.clf()
+            plt.xlabel(r'z[m]')
+            plt.ylabel(r'x[m]')
+            plt.xlim(L_n[0]-0.1*L_n[0],L[0]+0.1*L[0])
+            plt.ylim(L_n[1]-0.1*L_n[1],L[1]+0.1*L[1])
+
+            if not moving_mesh:
+                for si,s in enumerate(outline['segments']):
+                    plt.plot([vertices[s[0]][0],
+                              vertices[s[1]][0]],
+                             [vertices[s[0]][1],
+                              vertices[s[1]][1]],
+                             color=colors[si],
+                             linewidth=2,
+                             marker='o')
+            _draw_fields(plt.gca(), *fields)
+            plt.title(title)
+            plt.axis('equal')
+            plt.xlim((L_n[0]-0.1,L[0]+0.1))
+            plt.ylim((L_n[1]-0.1,L[1]+0.1))
+            if raw:
+                fig = plt.gcf()
+                buffers.append((int(round(fig.get_figwidth()*200)),
+                                int(round(fig.get_figheight()*200)),
+                                _savefig_rgba(fig)))
             else:
-                plt.tricontourf(x,y,elements,np.sqrt(u[:]**2 + v[:]**2))
+                plt.savefig(output_png+'phi{0:04d}.png'.format(it), dpi=200)
+        if cache is not None:
+            cache.put_file(key, output_png+'phi{0:04d}.png'.format(it))
+    archive.close()
+    return buffers if raw else len(frames)
+
+def _segment_colors(segmentFlags):
+    colors = ['w','b', 'g','r','c','m','y','k']*(max(segmentFlags)//8 + 1)
+    return [colors[f-1] for f in segmentFlags]
+
+def _draw_fields(ax, mesh, u, v, phi, vof, kappa, streamlines, single_phase, turbulence):
+    """Draw the time-dependent part of a frame on ax"""
+    import numpy as np
+    triang = mesh.triang
+    if single_phase:
+        if turbulence:
+            ax.tricontourf(triang,kappa)
         else:
-            plt.tricontourf(x,y,elements,wvof*np.sqrt(u[:]**2 + v[:]**2))
-            plt.tricontour(x,y,elements,phi,[0], linewidths=2, colors='w')
-        if streamlines:
-            u_interp_lin = mtri.LinearTriInterpolator(triang, u[:])
-            v_interp_lin = mtri.LinearTriInterpolator(triang, v[:])
-            u_lin = u_interp_lin(xi, yi)
-            v_lin = v_interp_lin(xi, yi)
-            plt.streamplot(xg, yg, u_lin, v_lin,color='k')
-            
+            ax.tricontourf(triang,np.sqrt(u**2 + v**2))
+    else:
+        wvof = np.ones(vof.shape,'d')
+        wvof -= vof
+        ax.tricontourf(triang,wvof*np.sqrt(u**2 + v**2))
+        ax.tricontour(triang,phi,[0], linewidths=2, colors='w')
+    if streamlines:
+        u_lin = mesh.interpolate(u)
+        v_lin = mesh.interpolate(v)
+        ax.streamplot(mesh.xg, mesh.yg, u_lin, v_lin,color='k')
+
+class BlitRenderer(object):
+    """
+    Frame renderer that draws the static decorations only once.
+
+    The axes and labels are drawn into a background image, and the
+    boundary outline (one LineCollection for all segments) into a
+    transparent overlay, when the renderer is created. Each frame restores
+    the background, draws the contour and streamline artists and the title,
+    composites the outline overlay on top and removes the artists again, so
+    the cost per frame does not depend on the number of boundary segments.
+    """
+    def __init__(self, outline, moving_mesh=False, dpi=200):
+        import numpy as np
+        from matplotlib import pyplot as plt
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.collections import LineCollection
+        from matplotlib.figure import Figure
+        L = outline['L']
+        L_n = outline['L_n']
+        # not a pyplot figure, so nothing shows up in the notebook
+        self.fig = Figure(figsize=plt.rcParams['figure.figsize'], dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot(111)
+        self.ax.set_xlabel(r'z[m]')
+        self.ax.set_ylabel(r'x[m]')
+        decorations = []
+        if not moving_mesh:
+            vertices = np.array(outline['vertices'])[:,:2]
+            segments = np.array(outline['segments'])
+            colors = _segment_colors(outline['segmentFlags'])
+            decorations.append(self.ax.add_collection(
+                LineCollection(vertices[segments], colors=colors, linewidths=2)))
+            decorations.append(self.ax.scatter(
+                vertices[segments.ravel(),0], vertices[segments.ravel(),1],
+                c=np.repeat(colors, 2), s=plt.rcParams['lines.markersize']**2, marker='o'))
+        self.ax.axis('equal')
+        self.ax.set_xlim((L_n[0]-0.1,L[0]+0.1))
+        self.ax.set_ylim((L_n[1]-0.1,L[1]+0.1))
+        self.ax.set_autoscale_on(False)
+        self.ax.title.set_animated(True)
+        for artist in decorations:
+            artist.set_animated(True)
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        # the outline goes on top of the contours, so keep it as a separate overlay
+        self.canvas.get_renderer().clear()
+        for artist in decorations:
+            self.ax.draw_artist(artist)
+            artist.remove()
+        overlay = np.array(self.canvas.buffer_rgba(), dtype='d').reshape(-1, 4)
+        self.overlay_pixels = np.flatnonzero(overlay[:,3] > 0)
+        self.overlay_alpha = overlay[self.overlay_pixels,3:]/255.0
+        self.overlay_rgb = overlay[self.overlay_pixels,:3]
+
+    def render(self, draw, title):
+        """Blit the artists added by draw(ax) over the background and return (width, height, rgba)"""
+        self.canvas.restore_region(self.background)
+        static = set(self.ax.get_children())
+        draw(self.ax)
+        artists = sorted([a for a in self.ax.get_children() if a not in static],
+                         key=lambda a: a.get_zorder())
+        for artist in artists:
+            self.ax.draw_artist(artist)
+        self.ax.title.set_text(title)
+        self.ax.draw_artist(self.ax.title)
+        import numpy as np
+        width, height = self.canvas.get_width_height()
+        pixels = np.array(self.canvas.buffer_rgba()).reshape(-1, 4)
+        base = pixels[self.overlay_pixels,:3]
+        pixels[self.overlay_pixels,:3] = np.round(self.overlay_alpha*self.overlay_rgb +
+                                                  (1.0 - self.overlay_alpha)*base)
+        for artist in artists:
+            artist.remove()
+        return width, height, pixels.tobytes()
+
+def _write_png(filename, width, height, rgba):
+    from PIL import Image
+    Image.frombuffer('RGBA', (width, height), rgba, 'raw', 'RGBA', 0, 1).save(filename, format='png')
+
+class FrameCache(object):
+    """
+    Content-addressed store of rendered frames.
+
+    A frame is keyed by a checksum of the archive datasets it was drawn
+    from, its time index and the plotting parameters, and stored as
+    <key>.png in directory. A frame whose key is already present does not
+    need to be drawn again; changing the data or any parameter changes the key.
+    """
+    version = 1
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def digest(*arrays):
+        import hashlib
+        import numpy as np
+        h = hashlib.sha1()
+        for a in arrays:
+            a = np.ascontiguousarray(a)
+            h.update(str((a.dtype, a.shape)).encode())
+            h.update(a.data)
+        return h.hexdigest()
+
+    def key(self, it, t, params, *digests):
+        import hashlib
+        return hashlib.sha1(repr((self.version, it, t, params, digests)).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key+'.png')
+
+    def get(self, key):
+        if os.path.exists(self.path(key)):
+            return self.path(key)
+        return None
+
+    def put_file(self, key, filename):
+        # write then rename so concurrent workers never see partial frames
+        tmp = self.path(key)+'.{0:d}.tmp'.format(os.getpid())
+        shutil.copyfile(filename, tmp)
+        os.replace(tmp, self.path(key))
+
+
+def _savefig_rgba(fig):
+    import io
+    buf = io.BytesIO()
+    fig.savefig(buf, format='rgba', dpi=200)
+    return buf.getvalue()
+
+def _init_worker():
+    # workers never display anything, so don't inherit the notebook backend
+    from matplotlib import pyplot as plt
+    plt.switch_backend('Agg')
+
+def _render_frames_star(args):
+    return _render_frames(*args)
+
+class VideoWriter(object):
+    """
+    Encode raw RGBA frames into a video file.
+
+    Frames are piped to an ffmpeg process when ffmpeg is on the path and
+    handed to imageio otherwise. imageio is not in environment.yml, so
+    without ffmpeg it has to be installed separately. The encoder is started on the first frame,
+    once the frame size is known.
+    """
+    def __init__(self, filename, fps=10, vcodec='h264'):
+        self.filename = filename
+        self.fps = fps
+        self.vcodec = vcodec
+        self.nFrames = 0
+        self.nBytes = 0
+        self.encode_time = 0.0
+        self.proc = None
+        self.writer = None
+
+    def _start(self, width, height):
+        import shutil
+        import subprocess
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+        if shutil.which('ffmpeg'):
+            cmd = ['ffmpeg', '-loglevel', 'quiet', '-y',
+                   '-f', 'rawvideo', '-pix_fmt', 'rgba',
+                   '-s', '{0:d}x{1:d}'.format(width, height),
+                   '-r', str(self.fps), '-i', '-',
+                   '-vcodec', self.vcodec, '-pix_fmt', 'yuv420p',
+                   self.filename]
+            # keep the conda libraries out of ffmpeg's way, as in the notebooks
+            self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                                         env=dict(os.environ, LD_LIBRARY_PATH=''))
+        else:
+            try:
+                import imageio
+            except ImportError:
+                raise RuntimeError("writing {0:s} needs ffmpeg on the path or the imageio package".format(self.filename))
+            self.writer = imageio.get_writer(self.filename, fps=self.fps, macro_block_size=1)
+
+    def write(self, width, height, rgba):
+        start = time.perf_counter()
+        if self.proc is None and self.writer is None:
+            self._start(width, height)
+        if self.proc is not None:
+            self.proc.stdin.write(rgba)
         else:
-            pass
-        plt.title('T={0:2.2f}'.format(t))
-        plt.axis('equal')
-        plt.xlim((domain.L_n[0]-0.1,domain.L[0]+0.1))
-        plt.ylim((domain.L_n[1]-0.1,domain.L[1]+0.1))
-        #        plt.figure(figsize=(10,5),dpi=100)
-        plt.savefig(output_png+'phi{0:04d}.png'.format(it), dpi=200)
-        try:
-            finished = archive.get_node("/nodesSpatial_Domain{0:d}".format(it+1))
-        except:
-            break
+            import numpy as np
+            self.writer.append_data(np.frombuffer(rgba, dtype=np.uint8).reshape(height, width, 4))
+        self.encode_time += time.perf_counter() - start
+        self.nFrames += 1
+        self.nBytes += len(rgba)
+
+    def close(self):
+        start = time.perf_counter()
+        if self.proc is not None:
+            self.proc.stdin.close()
+            self.proc.wait()
+        elif self.writer is not None:
+            self.writer.close()
+        self.encode_time += time.perf_counter() - start
+        if self.nFrames:
+            print("Encoded {0:d} frames into {1:s}: {2:.2f} frames/sec, {3:.1f} MB/s".format(
+                self.nFrames, self.filename,
+                self.nFrames/self.encode_time, self.nBytes/self.encode_time/1.0e6))
+
+def CreateFig(dt_output,h5,output_png,sim_name,moving_mesh=False,streamlines=True,single_phase=False, turbulence=False,
+              nprocs=1, light=True, polyfile=None, video=None, fps=10, cache=False, blit=False):
+    """
+    Render phi%04d.png for every output step in h5.
+
+    With nprocs > 1 the output steps are dealt round-robin to a process
+    pool; each worker opens its own read-only handle on the archive and
+    writes its own frames, so the images are the same as in serial.
+
+    With light=True the output times and outline are read from the XDMF
+    and .poly files (see load_metadata) instead of importing sim_name and
+    running its setup; the case is only imported if they are missing.
+    dt_output is then ignored: the frames are the steps saved in the
+    archive, at the times in its XDMF file.
+
+    With video='name.mp4' no PNGs are written: the frames are rendered to
+    raw RGBA buffers and streamed, in order, into a VideoWriter.
+
+    With cache=True PNG frames are also kept in a FrameCache next to the
+    archive (<h5 name>_frames/) and only missing or stale frames are drawn,
+    e.g. the new steps after extending final_time or all steps after
+    changing a plotting option. The cache doubles the disk space of the
+    frames and is not used with video, whose frames never touch the disk.
+
+    With blit=True the outline, axes and labels are drawn once and only the
+    contours, streamlines and title are redrawn per frame (see BlitRenderer).
+    The result is close to, but not pixel-identical with, the default path.
+    Returns the number of frames written.
+    """
+    if "png/" in output_png:
+        os.makedirs("png",exist_ok=True)
+    metadata = load_metadata(h5, sim_name, polyfile) if light else None
+    if metadata is None:
+        metadata = _load_case(dt_output, sim_name)
+    tnList, outline = metadata
+    with ArchiveReader(h5) as archive:
+        nFrames = min(archive.nSteps, len(tnList))
+    options = (moving_mesh, streamlines, single_phase, turbulence)
+    if video is not None:
+        return _stream_video(h5, nFrames, tnList, outline, options, nprocs, video, fps, blit)
+    cache_dir = os.path.splitext(h5)[0]+'_frames' if cache else None
+    if nprocs <= 1:
+        return _render_frames(h5, output_png, range(nFrames), tnList, outline, *options,
+                              False, cache_dir, blit)
+    from multiprocessing import Pool
+    chunks = [list(range(nFrames))[rank::nprocs] for rank in range(nprocs)]
+    with Pool(nprocs, initializer=_init_worker) as pool:
+        written = pool.map(_render_frames_star,
+                           [(h5, output_png, frames, tnList, outline) + options + (False, cache_dir, blit)
+                            for frames in chunks if frames])
+    return sum(written)
+
+def _stream_video(h5, nFrames, tnList, outline, options, nprocs, video, fps, blit):
+    writer = VideoWriter(video, fps=fps)
+    # consecutive blocks of frames, so only a few raw frames are held in memory
+    blockSize = max(1, min(8, nFrames//(4*nprocs)))
+    blocks = [list(range(start, min(start+blockSize, nFrames)))
+              for start in range(0, nFrames, blockSize)]
+    if nprocs <= 1:
+        for frames in blocks:
+            for frame in _render_frames(h5, None, frames, tnList, outline, *options, True, None, blit):
+                writer.write(*frame)
+    else:
+        from collections import deque
+        from multiprocessing import Pool
+        # at most 2*nprocs blocks are rendered ahead of the writer, which
+        # takes them back in order
+        pending = deque()
+        with Pool(nprocs, initializer=_init_worker) as pool:
+            for frames in blocks:
+                if len(pending) == 2*nprocs:
+                    for frame in pending.popleft().get():
+                        writer.write(*frame)
+                pending.append(pool.apply_async(_render_frames_star,
+                                                ((h5, None, frames, tnList, outline) + options + (True, None, blit),)))
+            while pending:
+                for frame in pending.popleft().get():
+                    writer.write(*frame)
+    writer.close()
+    return writer.nFrames
 
+def benchmark_CreateFig(dt_output,h5,output_png,sim_name,nprocs_list=(1,2,4,8),**kwargs):
+    """Report rendering throughput (frames/sec) against the number of workers"""
+    results = []
+    for nprocs in nprocs_list:
+        start = time.perf_counter()
+        nFrames = CreateFig(dt_output,h5,output_png,sim_name,nprocs=nprocs,**kwargs)
+        elapsed = time.perf_counter() - start
+        results.append((nprocs, nFrames, elapsed, nFrames/elapsed))
+        print("nprocs={0:3d} frames={1:5d} time={2:8.2f}s frames/sec={3:8.2f}".format(*results[-1]))
+    return results
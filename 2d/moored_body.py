@@ -4,6 +4,10 @@ from proteus.mprans import SpatialTools as st
 import proteus.TwoPhaseFlow.TwoPhaseFlowProblem as TpFlow
 import proteus.TwoPhaseFlow.utils.Parameters as Parameters
 from proteus import WaveTools as wt
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tools.wave_kinematics import WaveKinematics
 
 # dependencies for FSI
 from proteus.mbd import CouplingFSI as fsi
@@ -345,11 +349,15 @@ for tag, bc in tank.BC.items():
 
 smoothing = he*1.5
 dragAlpha = 5*2*np.pi/wave_period/(1.004e-6)
-tank.BC['x-'].setUnsteadyTwoPhaseVelocityInlet(wave,
+# the inlet and the generation zone share one evaluation of the wave; the
+# mesh moves, so per-point harmonic tables (PeriodicWaveKinematics) would be
+# resampled whenever the nodes do
+kinematics = WaveKinematics(wave)
+tank.BC['x-'].setUnsteadyTwoPhaseVelocityInlet(kinematics,
                                                smoothing=smoothing,
                                                vert_axis=1)
 tank.setGenerationZones(x_n=True,
-                        waves=wave,
+                        waves=kinematics,
                         smoothing=smoothing,
                         dragAlpha=dragAlpha)
 tank.setAbsorptionZones(x_p=True,
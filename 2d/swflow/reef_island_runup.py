@@ -9,6 +9,11 @@ from proteus.Profiling import logEvent
 from proteus.Gauges import PointGauges
 import proteus.SWFlow.SWFlowProblem as SWFlowProblem
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from tools.gauges import BufferedPointGauges
+from tools.bathymetry import NodalBathymetry
+from tools.initial_conditions import tabulate
 
 """
 We reproduce the 2009-2010 experiments of [Swigler, 2009] and
@@ -38,6 +43,7 @@ opts = Context.Options([
     ("reflecting_BCs", False, "Use reflecting BCs for all boundaries"),
     # Problem specific options
     ("want_gauges", False, "Output for water height point gauge"),
+    ("buffered_gauges", False, "Batch gauge output to the master every 100 samples"),
     ("mannings", 0., "Mannings roughness coefficient"), # usually = 0
     ("still_water_depth", 0.78, "Depth of still water above floor"),
     ("solitary_amplitude", 0.4, "Amplitude of solitary wave"),
@@ -131,6 +137,9 @@ def bathymetry_function(X):
     return bath
 
 
+bathymetry = NodalBathymetry(bathymetry_function)
+
+
 ######################
 # INITIAL CONDITIONS #
 ######################
@@ -139,16 +148,25 @@ def bathymetry_function(X):
 class water_height_at_t0(object):
     def uOfXT(self, X, t):
         hTilde = h0 + solitary_wave(X[0], 0)
-        h = max(hTilde - bathymetry_function(X), 0.)
+        h = max(hTilde - bathymetry(X), 0.)
         return h
 
+    def uOfXT_batch(self, X, t):
+        hTilde = h0 + solitary_wave(X[:, 0], 0)
+        return np.maximum(hTilde - bathymetry.evaluate(X.T), 0.)
+
 
 class x_mom_at_t0(object):
     def uOfXT(self, X, t):
         hTilde = h0 + solitary_wave(X[0], 0)
-        h = max(hTilde - bathymetry_function(X), 0.)
+        h = max(hTilde - bathymetry(X), 0.)
         return h * c * old_div(hTilde - h0, hTilde)
 
+    def uOfXT_batch(self, X, t):
+        hTilde = h0 + solitary_wave(X[:, 0], 0)
+        h = np.maximum(hTilde - bathymetry.evaluate(X.T), 0.)
+        return h * c * (hTilde - h0) / hTilde
+
 """
 heta and hw are needed for the hyperbolic serre-green-naghdi equations.
 For initial conditions, heta -> h^2, hbeta->q(dot)grad(Z), hw -> h^2div(u)+3/2*hbeta.
@@ -163,20 +181,33 @@ class heta_at_t0(object):
         h = water_height_at_t0().uOfXT(X, t)
         return h**2
 
+    def uOfXT_batch(self, X, t):
+        return water_height_at_t0().uOfXT_batch(X, t)**2
+
 
 class hw_at_t0(object):
     def uOfXT(self, X, t):
         sechSqd = (1.0 / np.cosh(r * (X[0] - xs)))**2.0
         hTilde = h0 + solitary_wave(X[0], 0)
-        h = max(hTilde - bathymetry_function(X), 0.)
+        h = max(hTilde - bathymetry(X), 0.)
         hTildePrime = -2.0 * alpha * r * np.tanh(r * (X[0] - xs)) * sechSqd
         hw = -h**2 * old_div(c * h0 * hTildePrime, hTilde**2)
         return hw
 
+    def uOfXT_batch(self, X, t):
+        sechSqd = (1.0 / np.cosh(r * (X[:, 0] - xs)))**2.0
+        hTilde = h0 + solitary_wave(X[:, 0], 0)
+        h = np.maximum(hTilde - bathymetry.evaluate(X.T), 0.)
+        hTildePrime = -2.0 * alpha * r * np.tanh(r * (X[:, 0] - xs)) * sechSqd
+        return -h**2 * c * h0 * hTildePrime / hTilde**2
+
 class Zero(object):
     def uOfXT(self, X, t):
         return 0.
 
+    def uOfXT_batch(self, X, t):
+        return np.zeros(len(X))
+
 ###############################
 ##### BOUNDARY CONDITIONS #####
 ###############################
@@ -205,6 +236,7 @@ initialConditions = {'water_height': water_height_at_t0(),
                      'h_times_eta': heta_at_t0(),
                      'h_times_w': hw_at_t0(),
                      'h_times_beta': Zero()}
+tabulate(initialConditions)
 boundaryConditions = {'water_height': lambda x, flag: None,
                       'x_mom': x_mom_DBC,
                       'y_mom': y_mom_DBC,
@@ -214,21 +246,27 @@ boundaryConditions = {'water_height': lambda x, flag: None,
 # **************************** #
 # ********** GAUGES ********** #
 # **************************** #
-reefPointGauges = PointGauges(gauges=((('h'), ((7.5, 0.0,  0),
-                                                 (13.0, 0.0, 0),
-                                                 (21.0, 0.0, 0),
-                                                 (7.5, 5.0, 0),
-                                                 (13.0, 5.0, 0),
-                                                 (21.0, 5.0, 0),
-                                                 (25.0, 0.0, 0),
-                                                 (25.0, 5.0, 0),
-                                                 (25.0, 10.0, 0))),
-                                        (('h_u', 'h_v'),
-                                                 ((13.0, 0.0,  0),
-                                                 (21.0, 0.0, 0),
-                                                 (21.0, -5.0, 0))),),
-                                activeTime=(0.01, opts.final_time),
-                                fileName='reef_gauges.csv')
+reefGauges = ((('h'), ((7.5, 0.0,  0),
+                       (13.0, 0.0, 0),
+                       (21.0, 0.0, 0),
+                       (7.5, 5.0, 0),
+                       (13.0, 5.0, 0),
+                       (21.0, 5.0, 0),
+                       (25.0, 0.0, 0),
+                       (25.0, 5.0, 0),
+                       (25.0, 10.0, 0))),
+              (('h_u', 'h_v'),
+                       ((13.0, 0.0,  0),
+                       (21.0, 0.0, 0),
+                       (21.0, -5.0, 0))),)
+if opts.buffered_gauges:
+    reefPointGauges = BufferedPointGauges(gauges=reefGauges,
+                                          activeTime=(0.01, opts.final_time),
+                                          fileName='reef_gauges.bin')
+else:
+    reefPointGauges = PointGauges(gauges=reefGauges,
+                                  activeTime=(0.01, opts.final_time),
+                                  fileName='reef_gauges.csv')
 
 # ********************************************* #
 # ********** Create my SWFlowProblem ********** #
@@ -244,7 +282,7 @@ mySWFlowProblem = SWFlowProblem.SWFlowProblem(sw_model=opts.sw_model,
                                               initialConditions=initialConditions,
                                               boundaryConditions=boundaryConditions,
                                               reflectingBCs=opts.reflecting_BCs,
-                                              bathymetry=bathymetry_function,
+                                              bathymetry=bathymetry,
                                               analyticalSolution=None)
 mySWFlowProblem.physical_parameters['mannings'] = opts.mannings
 if opts.want_gauges:
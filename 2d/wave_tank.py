@@ -3,6 +3,11 @@ from proteus import Domain, Context
 from proteus.mprans import SpatialTools as st
 import proteus.TwoPhaseFlow.TwoPhaseFlowProblem as TpFlow
 from proteus import WaveTools as wt
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tools.wave_kinematics import PeriodicWaveKinematics
+from tools.mesh_cache import cached_mesh
 
 
 # general options
@@ -93,11 +98,13 @@ tank.BC['sponge'].setNonMaterial()
 
 smoothing = he*1.5
 dragAlpha = 5*2*np.pi/wave_period/(1.004e-6)
-tank.BC['x-'].setUnsteadyTwoPhaseVelocityInlet(wave,
+# the inlet and the generation zone share one evaluation of the wave
+kinematics = PeriodicWaveKinematics(wave, wave_period, Nf)
+tank.BC['x-'].setUnsteadyTwoPhaseVelocityInlet(kinematics,
                                                smoothing=smoothing,
                                                vert_axis=1)
 tank.setGenerationZones(x_n=True,
-                        waves=wave,
+                        waves=kinematics,
                         smoothing=smoothing,
                         dragAlpha=dragAlpha)
 tank.setAbsorptionZones(x_p=True,
@@ -165,6 +172,8 @@ mesh_fileprefix = 'mesh'
 domain.MeshOptions.setOutputFiles(mesh_fileprefix)
 
 st.assembleDomain(domain)
+domain.MeshOptions.triangleOptions = "VApq30Dena%8.8f" % ((he**2)/2.0,)
+cached_mesh(domain, mesh_fileprefix)
 
 
 
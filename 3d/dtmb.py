@@ -4,15 +4,20 @@ Multiphase Flow Test
 from __future__ import division
 from past.utils import old_div
 import numpy as np
-from proteus import (Domain, Context, Gauges, LinearSolvers,
-                     MeshTools as mt)
+from proteus import (Domain, Context, Gauges, LinearSolvers)
 from proteus.Gauges import PointGauges, LineIntegralGauges, LineGauges
 from proteus.Profiling import logEvent
-from subprocess import check_call
 import proteus.TwoPhaseFlow.TwoPhaseFlowProblem as TpFlow
 from proteus.TwoPhaseFlow.utils.Parameters import ParametersPhysical as PP
 from proteus.ctransportCoefficients import smoothedHeaviside
 import math
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tools.signed_distance import WaterColumn, LevelSetIC, VOFIC, HydrostaticPressureIC
+from tools.boundary_conditions import BoundaryConditionTable, SeparableBC
+from tools.gmsh_mesh import convert
+from tools.initial_conditions import tabulate
 
 # *************************** #
 # ***** GENERAL OPTIONS ***** #
@@ -38,17 +43,8 @@ domain.geofile="dtmb"
 from proteus import Comm
 comm = Comm.get()
 if not opts.skip_gmsh and comm.isMaster():
-    #domain.MeshOptions.triangleOptions="VApq1.25q12feena%e" % ((he**3)/6.0,)
-    #gmsh_cmd = "gmsh {0:s} -v 10 -3 -o {1:s} -format msh2".format("boolean.geo", domain.geofile+".msh")
-    gmsh_cmd = "gmsh {0:s} -v 10 -3 -o {1:s} -format msh2 -clmax {2:e}".format(domain.geofile+".geo", domain.geofile+".msh",he)
-    check_call(gmsh_cmd, shell=True)
-    mt.msh2simplex(domain.geofile, nd=3)
-    check_call("tetgen -Vfeen {0:s}.ele".format(domain.polyfile), shell=True)
-    check_call("mv {0:s}.1.ele {0:s}.ele".format(domain.polyfile), shell=True)
-    check_call("mv {0:s}.1.node {0:s}.node".format(domain.polyfile), shell=True)
-    check_call("mv {0:s}.1.face {0:s}.face".format(domain.polyfile), shell=True)
-    check_call("mv {0:s}.1.neigh {0:s}.neigh".format(domain.polyfile), shell=True)
-    check_call("mv {0:s}.1.edge {0:s}.edge".format(domain.polyfile), shell=True)
+    convert(domain.geofile, he, log=logEvent)
+comm.barrier()
 domain.MeshOptions.genMesh=False
 
 # ****************************** #
@@ -62,55 +58,28 @@ class zero(object):
 waterLine_x = 1000.0
 waterLine_z = 0.25
 
-def signedDistance(x):
-    from math import sqrt
-    phi_x = x[0]-waterLine_x
-    phi_z = x[2]-waterLine_z
-    if phi_x < 0.0:
-        if phi_z < 0.0:
-            return max(phi_x,phi_z)
-        else:
-            return phi_z
-    else:
-        if phi_z < 0.0:
-            return phi_x
-        else:
-            return sqrt(phi_x**2 + phi_z**2)
+waterColumn = WaterColumn((waterLine_x, waterLine_z), axes=(0, 2))
 
 pp = PP()
 rho_1 = pp.densityB
 rho_0 = pp.densityA
 g = [0., 0., -9.81]
-class P:
-    def __init__(self,waterLevel):
-        self.waterLevel=waterLevel
-    def uOfXT(self,x,t):
-        if signedDistance(x) < 0:
-            return -(L[2] - self.waterLevel)*rho_1*g[2] - (self.waterLevel - x[2])*rho_0*g[2]
-        else:
-            return -(L[2] - x[2])*rho_1*g[2]
-
 class V:
     def __init__(self):
         pass
     def uOfXT(self,x,t):
         return 0.0
 
-class Phi:
-    def uOfXT(self,x,t):
-        return signedDistance(x)
-
-class VOF:
-    def uOfXT(self,x,t):
-        return smoothedHeaviside(1.5*he,signedDistance(x))
-
-initialConditions = {'pressure': P(waterLine_z),
-                     'vel_u': zero(),
-                     'vel_v': zero(),
-                     'vel_w': zero(),
-                     'vof': VOF(),
-                     'rdls': Phi(),
-                     'ncls': Phi()}
+pressureIC = HydrostaticPressureIC(waterColumn, waterLine_z, L[2], rho_0, rho_1, g[2], axis=2)
+vofIC = VOFIC(waterColumn, eps=1.5*he)
+phiIC = LevelSetIC(waterColumn)
+initialConditions = tabulate({'pressure': pressureIC,
+                              'vel_u': zero(),
+                              'vel_v': zero(),
+                              'vel_w': zero(),
+                              'vof': vofIC,
+                              'rdls': phiIC,
+                              'ncls': phiIC})
 
 
 # ******************************* #
@@ -122,106 +91,42 @@ model_scale=24.830
 def velRamp(t):
     return (opts.speed/model_scale)*min(1.0,t/40.0)
 
-# DIRICHLET BOUNDARY CONDITIONS #
-def vel_u_DBC(x,flag):
-    if flag == boundaryTags['left']:
-        return lambda x,t: velRamp(t)*(1.0-initialConditions['vof'].uOfXT(x,t))
-    elif flag == boundaryTags['hull']:
-        return lambda x,t: 0.0
-    elif flag == boundaryTags['right']:
-        return lambda x,t: 0.0
-
-def vel_v_DBC(x,flag):
-    if flag == boundaryTags['left']:
-        return lambda x,t: 0.0
-    elif flag == boundaryTags['hull']:
-        return lambda x,t: 0.0
-    elif flag == boundaryTags['right']:
-        return lambda x,t: 0.0
-
-def vel_w_DBC(x,flag):
-    if flag == boundaryTags['left']:
-        return lambda x,t: 0.0
-    elif flag == boundaryTags['hull']:
-        return lambda x,t: 0.0
-    elif flag == boundaryTags['right']:
-        return lambda x,t: 0.0
-
-def pressure_DBC(x,flag):
-    if flag == boundaryTags['right']:
-        return lambda x,t: initialConditions['pressure'].uOfXT(x,t)
-
-def vof_DBC(x,flag):
-    if flag in [boundaryTags['left'], boundaryTags['right']]:
-        return lambda x,t: initialConditions['vof'].uOfXT(x,t)
-
-def phi_DBC(x,flag):
-    if flag in [boundaryTags['left'], boundaryTags['right']]:
-        return lambda x,t: initialConditions['ncls'].uOfXT(x,t)
-
-
-# ADVECTIVE FLUX BOUNDARY CONDITIONS #
-def vel_u_AFBC(x,flag):
-    if flag in [0,boundaryTags['front'],boundaryTags['back'],boundaryTags['bottom'],boundaryTags['top']]:
-        return lambda x,t: 0.0
-
-def vel_v_AFBC(x,flag):
-    if flag in [0,boundaryTags['front'],boundaryTags['back'],boundaryTags['bottom'],boundaryTags['top']]:
-        return lambda x,t: 0.0
-
-def vel_w_AFBC(x,flag):
-    if flag in [0,boundaryTags['front'],boundaryTags['back'],boundaryTags['bottom'],boundaryTags['top']]:
-        return lambda x,t: 0.0
-
-def pressure_AFBC(x,flag):
-    if flag  == boundaryTags['left']:
-        return lambda x,t: -velRamp(t)*(1.0-initialConditions['vof'].uOfXT(x,t))
-    if flag  in [0,boundaryTags['front'],boundaryTags['back'],boundaryTags['bottom'],boundaryTags['top']]:
-        return lambda x,t: 0.0
-
-def vof_AFBC(x,flag):
-    if flag in [boundaryTags['left'],boundaryTags['right']]:
-        return None
-    else:
-        return lambda x,t: 0.0
-
-# DIFFUSIVE FLUX BOUNDARY CONDITIONS #
-def vel_u_DFBC(x,flag):
-    if flag in [0,boundaryTags['front'],boundaryTags['back'],boundaryTags['bottom'],boundaryTags['right'],boundaryTags['top']]:
-        return lambda x,t: 0.0
-
-def vel_v_DFBC(x,flag):
-    if flag in [0,boundaryTags['front'],boundaryTags['back'],boundaryTags['bottom'],boundaryTags['top']]:
-        return lambda x,t: 0.0
-
-def vel_w_DFBC(x,flag):
-    if flag in [0,boundaryTags['front'],boundaryTags['back'],boundaryTags['bottom'],boundaryTags['top']]:
-        return lambda x,t: 0.0
+# the inflow profile is fixed in space and only ramped in time; the profiles
+# use the initial conditions directly, the tables only cover the interpolation points
+inflow_u = SeparableBC(lambda x: 1.0-vofIC.uOfXT(x,0.0), velRamp)
+inflow_flux = inflow_u.scaled(-1.0)
+# the outflow and inflow states stay at their initial values
+outflow_p = SeparableBC(lambda x: pressureIC.uOfXT(x,0.0))
+inflow_vof = SeparableBC(lambda x: vofIC.uOfXT(x,0.0))
+inflow_phi = SeparableBC(lambda x: phiIC.uOfXT(x,0.0))
+
+walls = (0, 'front', 'back', 'bottom', 'top')
+bcTable = BoundaryConditionTable(boundaryTags, {
+    # DIRICHLET BCs #
+    'pressure_DBC': {'right': outflow_p},
+    'vel_u_DBC': {'left': inflow_u, ('hull', 'right'): 0.0},
+    'vel_v_DBC': {('left', 'hull', 'right'): 0.0},
+    'vel_w_DBC': {('left', 'hull', 'right'): 0.0},
+    'vof_DBC':  {('left', 'right'): inflow_vof},
+    'ncls_DBC': {('left', 'right'): inflow_phi},
+    # ADVECTIVE FLUX BCs #
+    'pressure_AFBC': {'left': inflow_flux, walls: 0.0},
+    'vel_u_AFBC': {walls: 0.0},
+    'vel_v_AFBC': {walls: 0.0},
+    'vel_w_AFBC': {walls: 0.0},
+    'vof_AFBC': {('left', 'right'): None, 'default': 0.0},
+    # DIFFUSIVE FLUX BCs #
+    'vel_u_DFBC': {walls + ('right',): 0.0},
+    'vel_v_DFBC': {walls: 0.0},
+    'vel_w_DFBC': {walls: 0.0},
+    'vof_DFBC': {}})
 
 ############################################
 # ***** Create myTwoPhaseFlowProblem ***** #
 ############################################
 outputStepping = TpFlow.OutputStepping(opts.final_time,dt_output=opts.dt_output)
 
-boundaryConditions = {
-    # DIRICHLET BCs #
-    'pressure_DBC': pressure_DBC,
-    'vel_u_DBC': vel_u_DBC,
-    'vel_v_DBC': vel_v_DBC,
-    'vel_w_DBC': vel_w_DBC,
-    'vof_DBC':  vof_DBC,
-    'ncls_DBC': phi_DBC,
-    # ADVECTIVE FLUX BCs #
-    'pressure_AFBC': pressure_AFBC,
-    'vel_u_AFBC': vel_u_AFBC,
-    'vel_v_AFBC': vel_v_AFBC,
-    'vel_w_AFBC': vel_w_AFBC,
-    'vof_AFBC': vof_AFBC,
-    # DIFFUSIVE FLUX BCs #
-    'vel_u_DFBC': vel_u_DFBC,
-    'vel_v_DFBC': vel_v_DFBC,
-    'vel_w_DFBC': vel_w_DFBC,
-    'vof_DFBC': lambda x, flag: None}
+boundaryConditions = bcTable.boundaryConditions()
 
 myTpFlowProblem = TpFlow.TwoPhaseFlowProblem(ns_model=0,
                                              ls_model=0,
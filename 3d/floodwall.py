@@ -13,6 +13,11 @@ import math
 from proteus.ctransportCoefficients import smoothedHeaviside
 from proteus.ctransportCoefficients import smoothedHeaviside_integral
 from proteus import WaveTools as wt
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tools.signed_distance import FreeSurface, HalfPlane, LevelSetIC, VOFIC
+from tools.initial_conditions import tabulate
 from proteus.mprans import SpatialTools as st
 
 # *************************** #
@@ -158,31 +163,11 @@ class zero(object):
     def uOfXT(self,x,t):
         return 0.
 
-def signedDistance(x):
-    if x[0]>2.1:
-        return x[2] - leeward_wl
-    else:
-        return x[2]-waterLevel
-
-    # a = ((x[0]-19)**2+(x[1]-4.5)**2)**0.5
-    # b = ((x[0]-19)**2+(x[1]+4.5)**2)**0.5
-
-    # if x[0]>18.0:
-    #     return x[2] - pro_wl
-    # elif a<4 or b<4:
-    #     return x[2] - pro_wl
-    # else:
-    #     return x[2] - waterLevel
+# leeward of the wall at x = 2.1 the water stands at leeward_wl
+freeSurface = FreeSurface(waterLevel, axis=2,
+                          region=HalfPlane((2.1,), (-1.0,)), regionLevel=leeward_wl)
 
 epsFact_consrv_heaviside=3.0
-class VF_IC:
-    def uOfXT(self, x, t):
-        return smoothedHeaviside(epsFact_consrv_heaviside*he,signedDistance(x))
-
-class PHI_IC:
-    def uOfXT(self, x, t):
-        return signedDistance(x)
-
 
 # ******************************* #
 # ***** BOUNDARY CONDITIONS ***** #
@@ -199,9 +184,10 @@ initialConditions = {'pressure': zero(),
                      'vel_u': zero(),
                      'vel_v': zero(),
                      'vel_w': zero(),
-                     'vof': VF_IC(),
-                     'ncls': PHI_IC(),
-                     'rdls': PHI_IC(),}
+                     'vof': VOFIC(freeSurface, eps=epsFact_consrv_heaviside*he),
+                     'ncls': LevelSetIC(freeSurface),
+                     'rdls': LevelSetIC(freeSurface),}
+tabulate(initialConditions)
 
 myTpFlowProblem = TpFlow.TwoPhaseFlowProblem(ns_model=0,
                                              ls_model=0,
@@ -4,14 +4,21 @@ Multiphase Flow Test
 from __future__ import division
 from past.utils import old_div
 import numpy as np
-from proteus import (Domain, Context, Gauges,
-                     MeshTools as mt)
+from proteus import (Domain, Context, Gauges)
 from proteus.Gauges import PointGauges, LineIntegralGauges, LineGauges
 from proteus.Profiling import logEvent
-from subprocess import check_call
 import proteus.TwoPhaseFlow.TwoPhaseFlowProblem as TpFlow
 #from proteus.TwoPhaseFlow.utils.Parameters import Parameters
 from proteus.ctransportCoefficients import smoothedHeaviside
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tools.signed_distance import WaterColumn, LevelSetIC, VOFIC, HydrostaticPressureIC
+from tools.boundary_conditions import BoundaryConditionTable
+from tools.mesh_cache import cached_mesh
+from tools.gauges import BufferedPointGauges
+from tools.gmsh_mesh import convert, default_threads
+from tools.initial_conditions import tabulate
 import math
 
 # *************************** #
@@ -21,9 +28,12 @@ opts= Context.Options([
     ("final_time",7.5,"Final time for simulation"),
     ("dt_output",0.1,"Time interval to output solution"),
     ("gauges", True, "Collect data for validation"),
+    ("buffered_gauges", False, "Sample the pressure gauges per rank with tools.gauges.BufferedPointGauges"),
     ("cfl",0.2,"Desired CFL restriction"),
     ("he",0.5,"Max mesh element diameter"),
-    ("use_gmsh",False,"Use gmsh to generate mesh")
+    ("use_gmsh",False,"Use gmsh to generate mesh"),
+    ("mesh_only",False,"Only write and mesh mesh.geo with gmsh on OMP_NUM_THREADS threads, then stop"),
+    ("skip_gmsh",False,"Assume the gmsh mesh has already been generated (by a mesh_only run)"),
     ])
 
 #assert opts.ns_model==1, "use ns_model=1 (rans3pf) for this"
@@ -32,28 +42,18 @@ opts= Context.Options([
 # ***** GAUGES ***** #
 # ****************** #
 if opts.gauges:
-    pressure_gauges = PointGauges(gauges=((('p',),
-                                           ((2.389,0.526,0.025), #P1
-                                            (2.389,0.526,0.099), #P3
-                                            (2.414,0.474,0.165), #P5
-                                            (2.487,0.474,0.165))),), #P7
-                                  fileName="pressure.csv")
-    point_height_gauges = PointGauges(gauges=((('phi',),
-                                               ((2.389,0.526,0.025), #P1
-                                                (2.389,0.526,0.099), #P3
-                                                (2.414,0.474,0.165), #P5
-                                                (2.487,0.474,0.165))),), #P7
-                                      fileName="point_clsvof.csv")
-    height_gauges = LineGauges(gauges=((("phi",),
-                                        (((2.724, 0.5, 0.0),
-                                          (2.724, 0.5, 1.0)),
-                                         ((2.228, 0.5, 0.0),
-                                          (2.228, 0.5, 1.0)),
-                                         ((1.732, 0.5, 0.0),
-                                          (1.732, 0.5, 1.0)),
-                                         ((0.582, 0.5, 0.0),
-                                          (0.582, 0.5, 1.0)))),),
-                               fileName="height.csv")
+    import marin_gauges
+    if opts.buffered_gauges:
+        # located per rank in the owned elements through a bin grid
+        pressure_gauges = BufferedPointGauges(gauges=marin_gauges.pressure_gauges,
+                                              fileName='pressure.bin', finalTime=opts.final_time)
+    else:
+        pressure_gauges = PointGauges(gauges=marin_gauges.pressure_gauges,
+                                      fileName=marin_gauges.fileNames['pressure'])
+    point_height_gauges = PointGauges(gauges=marin_gauges.point_height_gauges,
+                                      fileName=marin_gauges.fileNames['point_height'])
+    height_gauges = LineGauges(gauges=marin_gauges.height_gauges,
+                               fileName=marin_gauges.fileNames['height'])
 
 # *************************** #
 # ***** DOMAIN AND MESH ***** #
@@ -171,52 +171,37 @@ domain.MeshOptions.triangleOptions='VApq1.35q12feena2.0833333333333332e-02'
 domain.boundaryTags = boundaryTags
 domain.writePoly("mesh")
 from proteus import Comm
-if opts.use_gmsh:
+if opts.use_gmsh or opts.mesh_only:
     comm = Comm.get()
-    if comm.isMaster():
+    if comm.isMaster() and not opts.skip_gmsh:
         domain.writeGeo("mesh",he_max=he)
-        domain.MeshOptions.triangleOptions="VApq1.25q12feena%e" % ((he**3)/6.0,)
-        gmsh_cmd = "gmsh {0:s} -v 10 -3 -o {1:s} -format msh2".format(domain.geofile+".geo", domain.geofile+".msh")
-        check_call(gmsh_cmd, shell=True)
-        mt.msh2simplex("mesh",nd=3)
-domain.MeshOptions.genMesh=True#False
+        # threaded only in the separate mesh_only step, which has the node to itself
+        convert(domain.geofile, he, log=logEvent, nThreads=default_threads() if opts.mesh_only else 1)
+    comm.barrier()
+    if opts.mesh_only:
+        sys.exit(0)
+    domain.MeshOptions.genMesh=False
+else:
+    domain.MeshOptions.genMesh=True
+    cached_mesh(domain, "mesh")
 # ****************************** #
 # ***** INITIAL CONDITIONS ***** #
 # ****************************** #
 class zero(object):
     def uOfXT(self,x,t):
         return 0.
+    def uOfXT_batch(self,X,t):
+        return np.zeros(len(X))
 
 # Initial condition
 waterLine_x = 1.20
 waterLine_z = 0.55
 
-def signedDistance(x):
-    from math import sqrt
-    phi_x = x[0]-waterLine_x
-    phi_z = x[2]-waterLine_z 
-    if phi_x < 0.0:
-        if phi_z < 0.0:
-            return max(phi_x,phi_z)
-        else:
-            return phi_z
-    else:
-        if phi_z < 0.0:
-            return phi_x
-        else:
-            return sqrt(phi_x**2 + phi_z**2)
+waterColumn = WaterColumn((waterLine_x, waterLine_z), axes=(0, 2))
 
 rho_1 = 1.205
 rho_0 = 998.2
 g = [0., 0., -9.81]
-class P:
-    def __init__(self,waterLevel):
-        self.waterLevel=waterLevel
-    def uOfXT(self,x,t):
-        if signedDistance(x) < 0:
-            return -(L[2] - self.waterLevel)*rho_1*g[2] - (self.waterLevel - x[2])*rho_0*g[2]
-        else:
-            return -(L[2] - x[2])*rho_1*g[2]
 
 class V:
     def __init__(self):
@@ -224,123 +209,35 @@ class V:
     def uOfXT(self,x,t):
         return 0.0
 
-class Phi:       
-    def uOfXT(self,x,t):
-        return signedDistance(x)
-
-class VOF:
-    def uOfXT(self,x,t):
-        return smoothedHeaviside(1.5*he,signedDistance(x))
-
-
 
 # ******************************* #
 # ***** BOUNDARY CONDITIONS ***** #
 # ******************************* #
 non_slip_BCs=True
 openTop=True
-# DIRICHLET BOUNDARY CONDITIONS #
-def vel_u_DBC(x,flag):
-    if non_slip_BCs and (flag == boundaryTags['box_left'] or
-                         flag == boundaryTags['box_right'] or
-                         flag == boundaryTags['box_top'] or
-                         flag == boundaryTags['box_front'] or
-                         flag == boundaryTags['box_back']):
-        return lambda  x,t: 0.0
-
-def vel_v_DBC(x,flag):
-    if non_slip_BCs and (flag == boundaryTags['box_left'] or
-                         flag == boundaryTags['box_right'] or
-                         flag == boundaryTags['box_top'] or
-                         flag == boundaryTags['box_front'] or
-                         flag == boundaryTags['box_back']):
-        return lambda  x,t: 0.0
-
-def vel_w_DBC(x,flag):
-    if non_slip_BCs and (flag == boundaryTags['box_left'] or
-                         flag == boundaryTags['box_right'] or
-                         flag == boundaryTags['box_top'] or
-                         flag == boundaryTags['box_front'] or
-                         flag == boundaryTags['box_back']):
-        return lambda  x,t: 0.0
-    
-def pressure_DBC(x,flag):
-    if flag == boundaryTags['top'] and openTop:
-        return lambda x,t: 0.0
-
-def vof_DBC(x,flag):
-    if openTop and flag == boundaryTags['top']:
-        return lambda x,t: 1.0
-
-def phi_DBC(x,flag):
-    return None
-    
-# ADVECTIVE FLUX BOUNDARY CONDITIONS #
-def vel_u_AFBC(x,flag):
-    if non_slip_BCs and (flag == boundaryTags['box_left'] or
-                         flag == boundaryTags['box_right'] or
-                         flag == boundaryTags['box_top'] or
-                         flag == boundaryTags['box_front'] or
-                         flag == boundaryTags['box_back']):
-        return None
-    elif openTop and flag == boundaryTags['top']:
-        return None
-    else: #slip everywhere but the box
-        return lambda x,t: 0.0
-
-def vel_v_AFBC(x,flag):
-    if non_slip_BCs and (flag == boundaryTags['box_left'] or
-                         flag == boundaryTags['box_right'] or
-                         flag == boundaryTags['box_top'] or
-                         flag == boundaryTags['box_front'] or
-                         flag == boundaryTags['box_back']):
-        return None
-    elif openTop and flag == boundaryTags['top']:
-        return None
-    else: #slip everywhere but the box
-        return lambda x,t: 0.0
-
-def vel_w_AFBC(x,flag):
-    if non_slip_BCs and (flag == boundaryTags['box_left'] or
-                         flag == boundaryTags['box_right'] or
-                         flag == boundaryTags['box_top'] or
-                         flag == boundaryTags['box_front'] or
-                         flag == boundaryTags['box_back']):
-        return None
-    elif openTop and flag == boundaryTags['top']:
-        return None
-    else: #slip everywhere but the box
-        return lambda x,t: 0.0
-
-def pressure_AFBC(x,flag):
-    if not(flag == boundaryTags['top'] and openTop):
-        return lambda x,t: 0.0
-    
-def vof_AFBC(x,flag):
-    if openTop and flag == boundaryTags['top']:
-        return None
-    else:
-        return lambda x,t: 0.0
-
-boundaryConditions = {
+noSlipTags = ('box_left', 'box_right', 'box_top', 'box_front', 'box_back') if non_slip_BCs else ()
+topTags = ('top',) if openTop else ()
+bcTable = BoundaryConditionTable(boundaryTags, {
     # DIRICHLET BCs #
-    'pressure_DBC': pressure_DBC,
-    'vel_u_DBC': vel_u_DBC,
-    'vel_v_DBC': vel_v_DBC,
-    'vel_w_DBC': vel_w_DBC,
-    'vof_DBC':  vof_DBC,
-    'ncls_DBC': phi_DBC,
+    'pressure_DBC': {topTags: 0.0},
+    'vel_u_DBC': {noSlipTags: 0.0},
+    'vel_v_DBC': {noSlipTags: 0.0},
+    'vel_w_DBC': {noSlipTags: 0.0},
+    'vof_DBC':  {topTags: 1.0},
+    'ncls_DBC': {},
     # ADVECTIVE FLUX BCs #
-    'pressure_AFBC': pressure_AFBC,
-    'vel_u_AFBC': vel_u_AFBC,
-    'vel_v_AFBC': vel_v_AFBC,
-    'vel_w_AFBC': vel_w_AFBC,
-    'vof_AFBC': vof_AFBC,
+    # slip everywhere but the box
+    'pressure_AFBC': {topTags: None, 'default': 0.0},
+    'vel_u_AFBC': {noSlipTags + topTags: None, 'default': 0.0},
+    'vel_v_AFBC': {noSlipTags + topTags: None, 'default': 0.0},
+    'vel_w_AFBC': {noSlipTags + topTags: None, 'default': 0.0},
+    'vof_AFBC': {topTags: None, 'default': 0.0},
     # DIFFUSIVE FLUX BCs #
-    'vel_u_DFBC': lambda x, flag: lambda x,t: 0.,
-    'vel_v_DFBC': lambda x, flag: lambda x,t: 0.,
-    'vel_w_DFBC': lambda x, flag: lambda x,t: 0.,
-    'vof_DFBC': lambda x, flag: None}
+    'vel_u_DFBC': {'default': 0.},
+    'vel_v_DFBC': {'default': 0.},
+    'vel_w_DFBC': {'default': 0.},
+    'vof_DFBC': {}})
+boundaryConditions = bcTable.boundaryConditions()
 
 ############################################
 # ***** Create myTwoPhaseFlowProblem ***** #
@@ -360,20 +257,24 @@ myTpFlowProblem.SystemPhysics.useDefaultModels()
 
 m = myTpFlowProblem.SystemPhysics.modelDict 
 
-m['flow'].p.initialConditions['p'] = P(waterLine_z)
+m['flow'].p.initialConditions['p'] = HydrostaticPressureIC(waterColumn, waterLine_z, L[2], rho_0, rho_1, g[2], axis=2)
 m['flow'].p.initialConditions['u'] = zero()
 m['flow'].p.initialConditions['v'] = zero()
 m['flow'].p.initialConditions['w'] = zero()
-m['vof'].p.initialConditions['vof'] = VOF()
-m['ncls'].p.initialConditions['phi'] = Phi()
-m['rdls'].p.initialConditions['phid'] = Phi()
+m['vof'].p.initialConditions['vof'] = VOFIC(waterColumn, eps=1.5*he)
+m['ncls'].p.initialConditions['phi'] = LevelSetIC(waterColumn)
+m['rdls'].p.initialConditions['phid'] = LevelSetIC(waterColumn)
 m['mcorr'].p.initialConditions['phiCorr'] = zero()
+for model in m.values():
+    tabulate(model.p.initialConditions)
 
 auxVariables={'vof': [point_height_gauges, height_gauges],
               'pressure': [pressure_gauges]}
 
 #m['vof'].auxiliaryVariables += auxVariables['vof']
 #m['flow'].auxiliaryVariables += auxVariables['pressure']
+if opts.gauges and opts.buffered_gauges:
+    m['flow'].auxiliaryVariables += auxVariables['pressure']
 
 myTpFlowProblem.SystemPhysics.boundaryConditions = boundaryConditions
 myTpFlowProblem.SystemPhysics.gravity = g
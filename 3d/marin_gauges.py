@@ -0,0 +1,46 @@
+"""
+Gauge locations for the MARIN dambreak (marin.py)
+
+The same specifications are used for the proteus gauges in marin.py and
+for evaluating the gauges after the run from the saved archive:
+
+    python marin_gauges.py marin.h5
+
+and for timing the point location on the saved mesh:
+
+    python marin_gauges.py marin.h5 --benchmark
+"""
+import os
+import sys
+
+# P1, P3, P5, P7 on the box
+pressure_points = ((2.389,0.526,0.025), #P1
+                   (2.389,0.526,0.099), #P3
+                   (2.414,0.474,0.165), #P5
+                   (2.487,0.474,0.165)) #P7
+pressure_gauges = ((('p',), pressure_points),)
+point_height_gauges = ((('phi',), pressure_points),)
+# H1-H4 wave probes
+height_gauges = ((("phi",),
+                  (((2.724, 0.5, 0.0),
+                    (2.724, 0.5, 1.0)),
+                   ((2.228, 0.5, 0.0),
+                    (2.228, 0.5, 1.0)),
+                   ((1.732, 0.5, 0.0),
+                    (1.732, 0.5, 1.0)),
+                   ((0.582, 0.5, 0.0),
+                    (0.582, 0.5, 1.0)))),)
+fileNames = {'pressure': "pressure.csv",
+             'point_height': "point_clsvof.csv",
+             'height': "height.csv"}
+
+if __name__ == '__main__':
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from tools.gauges import PointGauges, LineGauges, benchmark_locate
+    h5 = sys.argv[1] if len(sys.argv) > 1 else 'marin.h5'
+    if '--benchmark' in sys.argv:
+        benchmark_locate(h5, nProbes=10000)
+        sys.exit(0)
+    PointGauges(pressure_gauges, fileName=fileNames['pressure']).evaluate(h5)
+    PointGauges(point_height_gauges, fileName=fileNames['point_height']).evaluate(h5)
+    LineGauges(height_gauges, fileName=fileNames['height']).evaluate(h5)
@@ -13,6 +13,12 @@ import math
 from proteus.ctransportCoefficients import smoothedHeaviside
 from proteus.ctransportCoefficients import smoothedHeaviside_integral
 from proteus import WaveTools as wt
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from tools.signed_distance import FreeSurface, HalfPlane, Ball, Union, LevelSetIC, VOFIC
+from tools.stl_boundary import BoundaryClassifier
+from tools.initial_conditions import tabulate
 
 # *************************** #
 # ***** GENERAL OPTIONS ***** #
@@ -58,53 +64,14 @@ boundaryOrientations = {'gate': np.array([-1., 0.,0.]),
                            }
 
 
-facetFlags=SG.facetFlags.tolist()
-vertexFlags=SG.vertexFlags.tolist()
-facets=SG.facets.tolist()
-vertices=SG.vertices.tolist()
-
-for i in range(len(SG.vertexFlags.tolist())):
-    if SG.vertices.tolist()[i][0]==min(SG.vertices[:,0]):
-        vertexFlags[i]=2
-    elif SG.vertices.tolist()[i][0]==max(SG.vertices[:,0]):
-        vertexFlags[i]=3
-    elif SG.vertices.tolist()[i][1]==min(SG.vertices[:,1]):
-        vertexFlags[i]=6
-    elif SG.vertices.tolist()[i][1]==max(SG.vertices[:,1]):
-        vertexFlags[i]=7
-    elif SG.vertices.tolist()[i][2]==min(SG.vertices[:,2]):
-        vertexFlags[i]=4
-    elif SG.vertices.tolist()[i][2]==max(SG.vertices[:,2]):
-        vertexFlags[i]=5
-    else:
-        vertexFlags[i]=1
-for i in range(len(facetFlags)):
-    if (vertices[facets[i][0][0]][0]==min(SG.vertices[:,0])
-        and vertices[facets[i][0][1]][0]==min(SG.vertices[:,0])
-        and vertices[facets[i][0][2]][0]==min(SG.vertices[:,0])):
-        facetFlags[i]=2
-    elif (vertices[facets[i][0][0]][0]==max(SG.vertices[:,0])
-          and vertices[facets[i][0][1]][0]==max(SG.vertices[:,0])
-          and vertices[facets[i][0][2]][0]==max(SG.vertices[:,0])):
-        facetFlags[i]=3
-    elif (vertices[facets[i][0][0]][1]==min(SG.vertices[:,1])
-          and vertices[facets[i][0][1]][1]==min(SG.vertices[:,1])
-          and vertices[facets[i][0][2]][1]==min(SG.vertices[:,1])):
-        facetFlags[i]=6
-    elif (vertices[facets[i][0][0]][1]==max(SG.vertices[:,1])
-          and vertices[facets[i][0][1]][1]==max(SG.vertices[:,1])
-          and vertices[facets[i][0][2]][1]==max(SG.vertices[:,1])):
-        facetFlags[i]=7
-    elif(vertices[facets[i][0][0]][2]==min(SG.vertices[:,2])
-         and vertices[facets[i][0][1]][2]==min(SG.vertices[:,2])
-         and vertices[facets[i][0][2]][2]==min(SG.vertices[:,2])):
-        facetFlags[i]=4
-    elif (vertices[facets[i][0][0]][2]==max(SG.vertices[:,2])
-          and vertices[facets[i][0][1]][2]==max(SG.vertices[:,2])
-          and vertices[facets[i][0][2]][2]==max(SG.vertices[:,2])):
-        facetFlags[i]=5
-    else:
-        facetFlags[i]=1
+classifier = BoundaryClassifier(SG.vertices, SG.facets)
+for axis, side, name in ((0, 'min', 'left'), (0, 'max', 'right'),
+                         (1, 'min', 'front'), (1, 'max', 'back'),
+                         (2, 'min', 'bottom'), (2, 'max', 'top')):
+    classifier.plane(axis, side, boundaryTags[name])
+vertexFlags, facetFlags = classifier.flags(default=boundaryTags['gate'])
+vertices = SG.vertices
+facets = SG.facets
 regions=[[0.5,0.5,0.5]]
 regionFlags=[1]
 holes=[[18.0,0.0,1.5]]
@@ -148,25 +115,14 @@ class zero(object):
     def uOfXT(self,x,t):
         return 0.
 
-def signedDistance(x):
-    a = ((x[0]-19.5)**2+(x[1]-4.5)**2)**0.5
-    b = ((x[0]-19.5)**2+(x[1]+4.5)**2)**0.5
-
-    if x[0]>18.0:
-        return x[2] - pro_wl
-    elif a<4 or b<4:
-        return x[2] - pro_wl
-    else:
-        return x[2] - waterLevel
+# the water stands at pro_wl beyond x = 18 and within 4 of (19.5, +-4.5)
+freeSurface = FreeSurface(waterLevel, axis=2,
+                          region=Union(HalfPlane((18.0,), (-1.0,)),
+                                       Ball((19.5, 4.5), 4.0),
+                                       Ball((19.5, -4.5), 4.0)),
+                          regionLevel=pro_wl)
 
 epsFact_consrv_heaviside=3.0
-class VF_IC:
-    def uOfXT(self, x, t):
-        return smoothedHeaviside(epsFact_consrv_heaviside*he,signedDistance(x))
-
-class PHI_IC:
-    def uOfXT(self, x, t):
-        return signedDistance(x)
     
 ############################################
 # ***** Create myTwoPhaseFlowProblem ***** #
@@ -177,9 +133,10 @@ initialConditions = {'pressure': zero(),
                      'vel_u': zero(),
                      'vel_v': zero(),
                      'vel_w': zero(),
-                     'vof': VF_IC(),
-                     'ncls': PHI_IC(),
-                     'rdls': PHI_IC(),}
+                     'vof': VOFIC(freeSurface, eps=epsFact_consrv_heaviside*he),
+                     'ncls': LevelSetIC(freeSurface),
+                     'rdls': LevelSetIC(freeSurface),}
+tabulate(initialConditions)
 
 myTpFlowProblem = TpFlow.TwoPhaseFlowProblem(ns_model=0,
                                              ls_model=0,
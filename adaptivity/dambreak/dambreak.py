@@ -7,6 +7,11 @@ from proteus.mprans import SpatialTools as st
 import proteus.TwoPhaseFlow.TwoPhaseFlowProblem as TpFlow
 from proteus.Gauges import PointGauges, LineIntegralGauges, LineGauges
 import numpy as np
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from tools.signed_distance import Ball, LevelSetIC, VOFIC
+from tools.initial_conditions import tabulate
 
 
 # *************************** #
@@ -72,21 +77,7 @@ waterLine_x = 1.2
 #            else:
 #                return (phi_x ** 2 + phi_y ** 2)**0.5
 
-class PHI_IC:
-    def uOfXT(self, x, t):
-        import math
-        radius = 0.5*waterLine_y
-        cx = waterLine_x
-        cy = waterLine_y
-        R = math.sqrt((x[0] - cx)**2 + (x[1] - cy)**2)
-        return R-radius
-
-class VF_IC:
-    def __init__(self):
-        self.phi = PHI_IC()
-    def uOfXT(self, x, t):
-        from proteus.ctransportCoefficients import smoothedHeaviside
-        return smoothedHeaviside(1.5*opts.he,self.phi.uOfXT(x,0.0))
+waterDrop = Ball((waterLine_x, waterLine_y), 0.5*waterLine_y)
 
 #########################
 # ***** Numerics ****** #
@@ -107,9 +98,10 @@ initialConditions = {'pressure': zero(),
                      'pressure_increment': zero(),
                      'vel_u': zero(),
                      'vel_v': zero(),
-                     'vof':  VF_IC(),
-                     'ncls': PHI_IC(),
-                     'rdls': PHI_IC()}
+                     'vof':  VOFIC(waterDrop, eps=1.5*opts.he),
+                     'ncls': LevelSetIC(waterDrop),
+                     'rdls': LevelSetIC(waterDrop)}
+tabulate(initialConditions)
 
 myTpFlowProblem = TpFlow.TwoPhaseFlowProblem(ns_model=0,
                                              ls_model=0,
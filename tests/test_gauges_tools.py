@@ -0,0 +1,110 @@
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tools.gauges import SimplexMesh, PointGauges, BufferedPointGauges, read_buffered_gauges
+from tools.spatial_index import BinGrid
+
+def structured_mesh(nd, n, jitter=0.2, seed=0):
+    """Unit square (cube) split into n**nd cells of 2 triangles (6 tetrahedra), interior nodes jittered"""
+    grid = np.stack(np.meshgrid(*[np.linspace(0.0, 1.0, n + 1)]*nd, indexing='ij'), -1).reshape(-1, nd)
+    interior = np.all((grid > 0.0) & (grid < 1.0), axis=1)
+    grid[interior] += jitter/n*(np.random.RandomState(seed).rand(interior.sum(), nd) - 0.5)
+    corners = np.stack(np.meshgrid(*[np.arange(n)]*nd, indexing='ij'), -1).reshape(-1, nd)
+    strides = (n + 1)**np.arange(nd - 1, -1, -1)
+    # Kuhn simplices: walk from the cell origin along each permutation of the axes
+    if nd == 2:
+        paths = [[0, 1], [1, 0]]
+    else:
+        paths = [[0, 1, 2], [0, 2, 1], [1, 0, 2], [1, 2, 0], [2, 0, 1], [2, 1, 0]]
+    elements = []
+    for path in paths:
+        steps = np.cumsum([strides[axis] for axis in path])
+        elements.append(np.column_stack([corners.dot(strides)] + [corners.dot(strides) + s for s in steps]))
+    return grid, np.concatenate(elements)
+
+def brute_force(nodes, elements, points, tol=1.0e-10):
+    """Barycentric coordinates of every point in every element"""
+    X = nodes[elements]
+    A = np.transpose(X[:, 1:] - X[:, :1], (0, 2, 1))
+    lam = np.linalg.solve(A[None], (points[:, None] - X[None, :, 0])[..., None])[..., 0]
+    lam = np.concatenate([1.0 - lam.sum(-1, keepdims=True), lam], axis=-1)
+    return lam, lam.min(-1) >= -tol
+
+def test_bin_grid_candidates():
+    for nd in (2, 3):
+        nodes, elements = structured_mesh(nd, 4)
+        grid = BinGrid(nodes, elements)
+        points = np.random.RandomState(1).rand(200, nd)
+        point, candidates = grid.candidates(points)
+        lam, inside = brute_force(nodes, elements, points)
+        listed = set(zip(point.tolist(), candidates.tolist()))
+        for i, e in zip(*np.nonzero(inside)):
+            assert (i, e) in listed
+
+def test_locate_and_interpolate():
+    for nd in (2, 3):
+        nodes, elements = structured_mesh(nd, 4)
+        mesh = SimplexMesh(nodes, elements)
+        points = np.concatenate([np.random.RandomState(2).rand(300, nd), [[1.5]*nd]])
+        found, weights = mesh.locate(points)
+        lam, inside = brute_force(nodes, elements, points)
+        assert found[-1] == -1 and np.all(found[:-1] >= 0)
+        assert np.all(inside[np.arange(len(points) - 1), found[:-1]])
+        assert np.allclose(weights[:-1], lam[np.arange(len(points) - 1), found[:-1]])
+        # barycentric interpolation is exact for linear fields
+        coefficients = np.arange(1.0, nd + 1.0)
+        nodal = nodes.dot(coefficients) + 0.5
+        interpolated = (weights*nodal[elements[found]]).sum(1)
+        assert np.allclose(interpolated[:-1], points[:-1].dot(coefficients) + 0.5)
+
+class Namespace(object):
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+class SerialComm(object):
+    rank = 0
+
+    def gather(self, value, root=0):
+        return [value]
+
+    def allgather(self, value):
+        return [value]
+
+def test_buffered_point_gauges(tmpdir):
+    import h5py
+    nodes, elements = structured_mesh(2, 5)
+    nodes = np.column_stack([nodes, np.zeros(len(nodes))])
+    times = [0.0, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0]
+    values = [np.sin(3.0*nodes[:, 0] + t)*nodes[:, 1] for t in times]
+    h5 = str(tmpdir.join('case.h5'))
+    with h5py.File(h5, 'w') as f:
+        for step, p in enumerate(values):
+            f['nodesSpatial_Domain%d' % step] = nodes
+            f['elementsSpatial_Domain%d' % step] = elements
+            f['p_t%d' % step] = p
+    gauges = ((('p',), ((0.13, 0.21, 0.0), (0.5, 0.5, 0.0), (0.87, 0.66, 0.0))),)
+    csv = str(tmpdir.join('gauges.csv'))
+    PointGauges(gauges, fileName=csv).evaluate(h5, times)
+    # the same run sampled live, flushed every 3 steps and at the final time
+    u = Namespace(dof=None, femSpace=Namespace(dofMap=Namespace(l2g=elements)))
+    mesh = Namespace(nodeArray=nodes, elementNodesArray=elements, nElements_owned=len(elements))
+    stepController = Namespace(t_model_last=None)
+    model = Namespace(stepController=stepController,
+                      levelModelList=[Namespace(mesh=mesh, u={0: u}, coefficients=Namespace(variableNames=['p']))])
+    binary = str(tmpdir.join('gauges.bin'))
+    buffered = BufferedPointGauges(gauges, fileName=binary, batchSize=3, finalTime=times[-1], comm=SerialComm())
+    buffered.attachModel(model, None)
+    for step, (t, p) in enumerate(zip(times, values)):
+        u.dof = p
+        stepController.t_model_last = t
+        if step == 0:
+            buffered.calculate_init()
+        else:
+            buffered.calculate()
+    assert buffered.times == []
+    header, data = read_buffered_gauges(binary)
+    with open(csv) as f:
+        assert f.readline() == header
+    assert np.allclose(data, np.loadtxt(csv, delimiter=',', skiprows=1), rtol=1e-12, atol=1e-14)
+    assert len(data) == len(times)
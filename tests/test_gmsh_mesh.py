@@ -0,0 +1,54 @@
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tools.gmsh_mesh import SimplexMesh3D, connectivity, default_threads
+
+def cube_mesh(n):
+    """Unit cube in n**3 cells of 6 tetrahedra, boundary triangles flagged 1..6 by side"""
+    nodes = np.stack(np.meshgrid(*[np.linspace(0.0, 1.0, n + 1)]*3, indexing='ij'), -1).reshape(-1, 3)
+    corners = np.stack(np.meshgrid(*[np.arange(n)]*3, indexing='ij'), -1).reshape(-1, 3)
+    strides = np.array([(n + 1)**2, n + 1, 1])
+    origin = corners.dot(strides)
+    elements = []
+    for path in ([0, 1, 2], [0, 2, 1], [1, 0, 2], [1, 2, 0], [2, 0, 1], [2, 1, 0]):
+        steps = np.cumsum(strides[path])
+        elements.append(np.column_stack([origin] + [origin + s for s in steps]))
+    elements = np.concatenate(elements)
+    faces = np.sort(elements[:, [[1, 2, 3], [0, 2, 3], [0, 1, 3], [0, 1, 2]]].reshape(-1, 3), axis=1)
+    faces, counts = np.unique(faces, axis=0, return_counts=True)
+    triangles = faces[counts == 1]
+    centroids = nodes[triangles].mean(1)
+    axis = np.argmin(np.minimum(centroids, 1.0 - centroids), axis=1)
+    triangleFlags = 1 + 2*axis + (centroids[np.arange(len(axis)), axis] > 0.5)
+    return SimplexMesh3D(nodes, elements, np.zeros(len(elements), dtype=np.int64), triangles, triangleFlags)
+
+def test_connectivity_counts():
+    n = 3
+    mesh = connectivity(cube_mesh(n))
+    nNodes, nElements = (n + 1)**3, 6*n**3
+    nBoundary = 6*2*n**2
+    assert len(mesh.faces) == (4*nElements + nBoundary)//2
+    # Euler characteristic of a ball: V - E + F - T = 1
+    assert nNodes - len(mesh.edges) + len(mesh.faces) - nElements == 1
+    assert (mesh.neighbors == -1).sum() == nBoundary
+    assert np.bincount(mesh.faceFlags, minlength=7).tolist() == [len(mesh.faces) - nBoundary] + [2*n**2]*6
+    # neighbors are symmetric and share the face opposite the vertex
+    element, slot = np.nonzero(mesh.neighbors >= 0)
+    other = mesh.neighbors[element, slot]
+    assert np.all((mesh.neighbors[other] == element[:, None]).any(1))
+    shared = np.array([len(set(a) & set(b)) for a, b in zip(mesh.elements[element].tolist(),
+                                                            mesh.elements[other].tolist())])
+    assert np.all(shared == 3)
+    # edges and nodes on the boundary carry a flag, the interior ones do not
+    onBoundary = np.any((mesh.nodes == 0.0) | (mesh.nodes == 1.0), axis=1)
+    assert np.array_equal(mesh.nodeFlags > 0, onBoundary)
+    boundaryEdges = set(tuple(sorted(e)) for t in mesh.triangles.tolist() for e in ((t[0], t[1]), (t[0], t[2]), (t[1], t[2])))
+    assert np.array_equal(mesh.edgeFlags > 0, [tuple(e) in boundaryEdges for e in mesh.edges.tolist()])
+
+def test_default_threads(monkeypatch):
+    for value, threads in (("8", 8), ("0", 1), ("", 1), ("4,2", 1), ("many", 1)):
+        monkeypatch.setenv('OMP_NUM_THREADS', value)
+        assert default_threads() == threads
+    monkeypatch.delenv('OMP_NUM_THREADS')
+    assert default_threads() == 1
@@ -0,0 +1,93 @@
+import math
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tools.signed_distance import (WaterColumn, Ball, Union, HalfPlane, FreeSurface,
+                                   HydrostaticPressureIC, LevelSetIC, VOFIC)
+
+# the closed forms the cases used before tools.signed_distance
+
+def column_distance(x, corner_x, corner_y):
+    phi_x = x[0] - corner_x
+    phi_y = x[1] - corner_y
+    if phi_x < 0.0:
+        if phi_y < 0.0:
+            return max(phi_x, phi_y)
+        else:
+            return phi_y
+    else:
+        if phi_y < 0.0:
+            return phi_x
+        else:
+            return (phi_x ** 2 + phi_y ** 2)**0.5
+
+def sector_gate_distance(x, waterLevel, pro_wl):
+    a = ((x[0]-19.5)**2+(x[1]-4.5)**2)**0.5
+    b = ((x[0]-19.5)**2+(x[1]+4.5)**2)**0.5
+    if x[0]>18.0:
+        return x[2] - pro_wl
+    elif a<4 or b<4:
+        return x[2] - pro_wl
+    else:
+        return x[2] - waterLevel
+
+def floodwall_distance(x, waterLevel, leeward_wl):
+    if x[0]>2.1:
+        return x[2] - leeward_wl
+    else:
+        return x[2]-waterLevel
+
+def drop_distance(x, cx, cy, radius):
+    return math.sqrt((x[0] - cx)**2 + (x[1] - cy)**2) - radius
+
+def points(lo, hi, n=500, seed=0):
+    lo = np.asarray(lo, dtype='d')
+    hi = np.asarray(hi, dtype='d')
+    return lo + (hi - lo)*np.random.RandomState(seed).rand(n, len(lo))
+
+def check(shape, old, X):
+    expected = np.array([old(x) for x in X])
+    assert np.allclose([shape(x) for x in X], expected, rtol=0.0, atol=1.0e-12)
+    assert np.allclose(shape.batch(X), expected, rtol=0.0, atol=1.0e-12)
+
+def test_water_column():
+    X = points([0.0, 0.0, 0.0], [3.22, 1.8, 0.0])
+    check(WaterColumn((1.2, 0.6)), lambda x: column_distance(x, 1.2, 0.6), X)
+    # (x, z) corner in 3D as in marin and dtmb
+    X = points([0.0, 0.0, 0.0], [3.22, 1.0, 1.0])
+    check(WaterColumn((1.22, 0.55), axes=(0, 2)), lambda x: column_distance([x[0], x[2]], 1.22, 0.55), X)
+
+def test_free_surface_regions():
+    X = points([0.0, -10.0, 0.0], [30.0, 10.0, 2.0])
+    sectorGate = FreeSurface(1.0, axis=2,
+                             region=Union(HalfPlane((18.0,), (-1.0,)),
+                                          Ball((19.5, 4.5), 4.0),
+                                          Ball((19.5, -4.5), 4.0)),
+                             regionLevel=1.5)
+    check(sectorGate, lambda x: sector_gate_distance(x, 1.0, 1.5), X)
+    X = points([0.0, 0.0, 0.0], [5.0, 1.0, 1.0])
+    floodwall = FreeSurface(0.6, axis=2, region=HalfPlane((2.1,), (-1.0,)), regionLevel=0.2)
+    check(floodwall, lambda x: floodwall_distance(x, 0.6, 0.2), X)
+
+def test_drop():
+    X = points([0.0, 0.0, 0.0], [3.22, 1.8, 0.0])
+    check(Ball((0.6, 0.9), 0.45), lambda x: drop_distance(x, 0.6, 0.9, 0.45), X)
+
+def test_initial_conditions():
+    L = [3.22, 1.0, 1.8]
+    rho_0, rho_1, g = 998.2, 1.205, [0.0, 0.0, -9.81]
+    column = WaterColumn((1.22, 0.55), axes=(0, 2))
+    X = points([0.0, 0.0, 0.0], L)
+
+    def pressure(x):
+        if column_distance([x[0], x[2]], 1.22, 0.55) < 0:
+            return -(L[2] - 0.55)*rho_1*g[2] - (0.55 - x[2])*rho_0*g[2]
+        else:
+            return -(L[2] - x[2])*rho_1*g[2]
+    ic = HydrostaticPressureIC(column, 0.55, L[2], rho_0, rho_1, g[2], axis=2)
+    expected = np.array([pressure(x) for x in X])
+    assert np.allclose([ic.uOfXT(x, 0.0) for x in X], expected)
+    assert np.allclose(ic.uOfXT_batch(X, 0.0), expected)
+    for ic in (LevelSetIC(column), VOFIC(column, eps=0.3)):
+        assert np.allclose(ic.uOfXT_batch(X, 0.0), [ic.uOfXT(x, 0.0) for x in X])
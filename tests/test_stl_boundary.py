@@ -0,0 +1,58 @@
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tools.stl_boundary import BoundaryClassifier
+
+stl = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '3d', 'sector_gate', 'SG_full_2.stl')
+boundaries = ['gate', 'left', 'right', 'bottom', 'top', 'front', 'back']
+boundaryTags = dict([(key, i + 1) for (i, key) in enumerate(boundaries)])
+
+def read_stl(fileName):
+    """Vertices and (nFacets, 1, 3) facets of an ASCII STL file, as st.ShapeSTL gives them"""
+    with open(fileName) as f:
+        X = np.array([line.split()[1:] for line in f if line.strip().startswith('vertex')], dtype='d')
+    vertices, facets = np.unique(X, axis=0, return_inverse=True)
+    return vertices, facets.reshape(-1, 1, 3)
+
+def sector_gate_loop(vertices, facets):
+    """The flags sector_gate.py computed before BoundaryClassifier"""
+    vertexFlags = [0]*len(vertices)
+    facetFlags = [0]*len(facets)
+    sides = [(0, min, 2), (0, max, 3), (1, min, 6), (1, max, 7), (2, min, 4), (2, max, 5)]
+    for i in range(len(vertexFlags)):
+        vertexFlags[i] = 1
+        for axis, bound, flag in sides:
+            if vertices.tolist()[i][axis] == bound(vertices[:, axis]):
+                vertexFlags[i] = flag
+                break
+    for i in range(len(facetFlags)):
+        facetFlags[i] = 1
+        for axis, bound, flag in sides:
+            if all(vertices[facets[i][0][j]][axis] == bound(vertices[:, axis]) for j in range(3)):
+                facetFlags[i] = flag
+                break
+    return vertexFlags, facetFlags
+
+def test_sector_gate_flags():
+    vertices, facets = read_stl(stl)
+    classifier = BoundaryClassifier(vertices, facets)
+    for axis, side, name in ((0, 'min', 'left'), (0, 'max', 'right'),
+                             (1, 'min', 'front'), (1, 'max', 'back'),
+                             (2, 'min', 'bottom'), (2, 'max', 'top')):
+        classifier.plane(axis, side, boundaryTags[name])
+    vertexFlags, facetFlags = classifier.flags(default=boundaryTags['gate'])
+    oldVertexFlags, oldFacetFlags = sector_gate_loop(vertices, facets)
+    assert vertexFlags.tolist() == oldVertexFlags
+    assert facetFlags.tolist() == oldFacetFlags
+    assert len(set(facetFlags.tolist())) == 7
+
+def test_rule_order():
+    vertices, facets = read_stl(stl)
+    classifier = BoundaryClassifier(vertices, facets)
+    classifier.normal([0.0, 0.0, 1.0], 9, oriented=False)
+    classifier.predicate(lambda X: X[:, 2] > -np.inf, 8)
+    vertexFlags, facetFlags = classifier.flags()
+    horizontal = np.abs(classifier.normals()[:, 2]) >= np.cos(np.radians(1.0))
+    assert np.array_equal(facetFlags == 9, horizontal)
+    assert np.all(facetFlags[~horizontal] == 8)
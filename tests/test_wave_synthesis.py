@@ -0,0 +1,113 @@
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tools.wave_synthesis import SpectralWaveKinematics, SeaState, cached_wave
+
+class SerialComm(object):
+    def isMaster(self):
+        return True
+
+    def barrier(self):
+        pass
+
+def taper(t):
+    return np.minimum(1.0, t)
+
+class Windows(object):
+    """Stand-in for the TimeSeries a RandomWavesFast decomposes its windows into"""
+    def __init__(self, nWindows, N):
+        random = np.random.RandomState(nWindows)
+        self.decompose_window = [[random.rand(N), random.rand(N), random.rand(N)] for i in range(nWindows)]
+        self.Twindow = 10.0
+        self.params = {'Nwaves': 15, 'Window': 'costap'}
+        self.filter = taper
+
+    def eta(self, x, t):
+        ai, omega, phi = self.decompose_window[min(int(t//self.Twindow), len(self.decompose_window) - 1)]
+        return self.filter(t)*np.sum(ai*np.cos(omega*t - x[0] + phi))
+
+class FastWaves(object):
+    built = 0
+
+    def __init__(self, Tstart, Tend, N, Nwaves=15):
+        FastWaves.built += 1
+        self.TS = Windows(int((Tend - Tstart)//10) + 1, N)
+        self.shared = self.TS
+        self.eta = self.TS.eta
+        self.ho = np.float64(0.5)
+        self.x0 = (0.0, 0.0, 0.0)
+
+class Unstorable(FastWaves):
+    def __init__(self, **arguments):
+        FastWaves.__init__(self, **arguments)
+        self.eta = lambda x, t: 0.0
+
+def test_cached_wave(tmpdir):
+    cacheDir = str(tmpdir.join('wave_cache'))
+    arguments = dict(Tstart=0.0, Tend=45.0, N=64)
+    built = FastWaves.built
+    direct = FastWaves(**arguments)
+    first = cached_wave(FastWaves, cacheDir, SerialComm(), **arguments)
+    second = cached_wave(FastWaves, cacheDir, SerialComm(), **arguments)
+    assert FastWaves.built == built + 2
+    assert isinstance(second.TS.decompose_window[0][0], np.memmap)
+    assert second.shared is second.TS and second.eta.__self__ is second.TS
+    assert second.TS.filter is taper and second.x0 == (0.0, 0.0, 0.0)
+    for t in (0.5, 12.0, 44.0):
+        assert second.eta([1.0, 0.0, 0.0], t) == direct.eta([1.0, 0.0, 0.0], t) == first.eta([1.0, 0.0, 0.0], t)
+    # every constructor argument is in the key
+    other = cached_wave(FastWaves, cacheDir, SerialComm(), Nwaves=8, **arguments)
+    assert FastWaves.built == built + 3 and isinstance(other, FastWaves)
+    assert len(os.listdir(cacheDir)) == 2
+
+def test_unstorable_wave_is_built(tmpdir):
+    cacheDir = str(tmpdir.join('wave_cache'))
+    messages = []
+    for i in range(2):
+        wave = cached_wave(Unstorable, cacheDir, SerialComm(), log=messages.append, Tstart=0.0, Tend=5.0, N=4)
+        assert wave.eta(None, 0.0) == 0.0
+    assert len(messages) == 2 and not os.path.exists(cacheDir)
+
+def random_sea(N=200, Tp=2.0, Hs=0.15, depth=0.4, g=9.81):
+    """Components of a linear random sea as RandomWaves holds them, x along the waves and y up"""
+    fi = np.linspace(0.5/Tp, 2.0/Tp, N)
+    omega = 2*np.pi*fi
+    ki = omega**2/g
+    for i in range(50):
+        ki = omega**2/(g*np.tanh(ki*depth))
+    ai = np.exp(-(Tp*fi - 1.0)**2/0.02)
+    ai *= Hs/4.0/np.sqrt((ai**2).sum()/2.0)
+    waveDir = np.array([1.0, 0.0, 0.0])
+    return SeaState(fi=fi, ai=ai, phi=2*np.pi*np.random.RandomState(3).rand(N), ki=ki,
+                    kDir=np.outer(ki, waveDir), waveDir=waveDir, vDir=np.array([0.0, 1.0, 0.0]),
+                    mwl=depth, depth=depth)
+
+def direct_sum(sea, x, t):
+    phase = sea.kDir.dot(x) - 2*np.pi*sea.fi*t + sea.phi
+    k = sea.ki
+    Z = x[1] - sea.mwl
+    uh = (sea.ai*2*np.pi*sea.fi*np.cosh(k*(Z + sea.depth))/np.sinh(k*sea.depth)*np.cos(phase)).sum()
+    uv = (sea.ai*2*np.pi*sea.fi*np.sinh(k*(Z + sea.depth))/np.sinh(k*sea.depth)*np.sin(phase)).sum()
+    return (sea.ai*np.cos(phase)).sum(), np.array([uh, uv, 0.0])
+
+def test_spectral_kinematics():
+    sea = random_sea()
+    kinematics = SpectralWaveKinematics(sea)
+    # an inlet column and generation zone points, between the levels
+    X = np.array([[0.0, y, 0.0] for y in (0.45, 0.4, 0.31, 0.17, 0.04)] + [[-1.3, 0.2, 0.0], [-2.7, 0.35, 0.0]])
+    times = 50.0 + 0.03*np.arange(40)
+    for t in times:
+        direct = [direct_sum(sea, x, t) for x in X]
+        eta, U = kinematics.batch(X, t)
+        assert np.allclose(eta, [d[0] for d in direct], rtol=0.0, atol=1e-4)
+        assert np.allclose(U, [d[1] for d in direct], rtol=0.0, atol=1e-3)
+        for x, d in zip(X, direct):
+            assert abs(kinematics.eta(x, t) - d[0]) < 1e-4
+            assert np.allclose(kinematics.u(x, t), d[1], rtol=0.0, atol=1e-3)
+    # one table per horizontal position
+    assert len(kinematics.tables) == 3
+    small = SpectralWaveKinematics(sea, checkAcc=False, maxBytes=2*(256 + 3)*(1 + 2*kinematics.nLevels)*16)
+    for x in X:
+        small(x, 50.0)
+    assert small.maxPositions == 2 and list(small.tables) == [(-1.3, 0.0, 0.0), (-2.7, 0.0, 0.0)]
@@ -0,0 +1,9 @@
+"""
+Shared utilities for the tutorial cases and notebooks.
+
+Case files and notebooks outside this directory put the repository root on
+sys.path and import the modules from here, e.g.
+
+    sys.path.append('../..')
+    from tools.archive import ArchiveReader
+"""
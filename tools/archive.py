@@ -0,0 +1,102 @@
+"""
+Lazy, read-only access to the HDF5 archives written by proteus.
+"""
+import os
+import re
+import numpy as np
+
+def xdmf_times(xmf):
+    """Output times, in archive order, from the XDMF file written next to the h5"""
+    times = []
+    with open(xmf) as f:
+        for value in re.findall(r'<Time\s+Value="([^"]+)"', f.read()):
+            t = float(value)
+            if not times or t != times[-1]:
+                times.append(t)
+    return times
+
+class ArchiveReader(object):
+    """
+    Index of the time-step datasets in a proteus HDF5 archive.
+
+    The dataset names are scanned once when the reader is opened: every
+    "<field>_t<n>" dataset is recorded as step n of field, and the mesh
+    datasets "nodesSpatial_Domain<n>"/"elementsSpatial_Domain<n>" as step
+    n of "nodes"/"elements". Nothing is read until a field is asked for,
+    and then only that field (and, with rows, only those rows).
+
+    With mmap=True contiguous, uncompressed datasets are returned as
+    read-only numpy memmaps of the file instead of being copied into memory;
+    other datasets fall back to ordinary (chunked) reads. iter_chunks reads
+    a single dataset in blocks of rows so big 3D archives can be scanned
+    with a bounded memory footprint.
+    """
+    _field = re.compile(r'^(?P<name>.+)_t(?P<step>\d+)$')
+    _mesh = re.compile(r'^(?P<name>nodes|elements)Spatial_Domain(?P<step>\d+)$')
+
+    def __init__(self, filename, mmap=False):
+        import h5py
+        self.filename = filename
+        self.mmap = mmap
+        self.file = h5py.File(filename, 'r')
+        self.fields = {}
+        for name in self.file.keys():
+            match = self._mesh.match(name) or self._field.match(name)
+            if match:
+                self.fields.setdefault(match.group('name'), {})[int(match.group('step'))] = name
+        self.nSteps = 0
+        while self.nSteps in self.fields.get('nodes', {}):
+            self.nSteps += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    @property
+    def times(self):
+        """Output times from the XDMF file next to the archive"""
+        return xdmf_times(os.path.splitext(self.filename)[0]+'.xmf')
+
+    def steps(self, *names):
+        """Sorted steps at which all the named fields were written"""
+        steps = None
+        for name in names:
+            available = set(self.fields.get(name, {}))
+            steps = available if steps is None else steps & available
+        return sorted(steps or [])
+
+    def dataset(self, name, step):
+        return self.file[self.fields[name][step]]
+
+    def get(self, name, step=0, rows=None):
+        """Values of field name at step; rows selects a subset (slice or sorted index array)"""
+        ds = self.dataset(name, step)
+        if self.mmap and ds.chunks is None and ds.compression is None and ds.id.get_offset() is not None:
+            data = np.memmap(self.filename, dtype=ds.dtype, mode='r',
+                             offset=ds.id.get_offset(), shape=ds.shape)
+            return data if rows is None else data[rows]
+        return ds[()] if rows is None else ds[rows]
+
+    def nodes(self, step=0):
+        return self.get('nodes', step)
+
+    def elements(self, step=0):
+        return self.get('elements', step)
+
+    def iter_steps(self, names, steps=None, rows=None):
+        """Yield (step, {name: values}) for each step, reading only the named fields"""
+        if steps is None:
+            steps = self.steps(*names)
+        for step in steps:
+            yield step, dict((name, self.get(name, step, rows)) for name in names)
+
+    def iter_chunks(self, name, step=0, chunk_rows=2**20):
+        """Yield (start, values) blocks of at most chunk_rows rows of one dataset"""
+        ds = self.dataset(name, step)
+        for start in range(0, ds.shape[0], chunk_rows):
+            yield start, ds[start:start+chunk_rows]
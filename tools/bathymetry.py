@@ -0,0 +1,79 @@
+"""
+Bathymetry evaluated once on the mesh nodes and cached on disk.
+
+SWFlow evaluates the bathymetry function on all mesh nodes, X = nodes.T,
+while the initial conditions call it again point by point. NodalBathymetry
+wraps the function so that the first array call, SWFlow's on the nodes,
+is cached under a key made of the node coordinates and the source of the
+function, and the pointwise calls at mesh nodes become lookups by node
+index. Array calls on other points, such as the batch initial conditions,
+go through evaluate(), which calls the function and leaves the node table
+and the cache alone:
+
+    bathymetry = NodalBathymetry(bathymetry_function)
+    ...
+    h = max(hTilde - bathymetry(X), 0.)                 # uOfXT
+    h = np.maximum(hTilde - bathymetry.evaluate(X.T), 0.)   # uOfXT_batch
+    ...
+    SWFlowProblem.SWFlowProblem(..., bathymetry=bathymetry, ...)
+
+The key does not see module-level constants used by the function, so
+clear cacheDir after changing them.
+"""
+import hashlib
+import inspect
+import os
+import numpy as np
+
+class NodalBathymetry(object):
+    def __init__(self, function, cacheDir='bathymetry_cache'):
+        self.function = function
+        self.cacheDir = cacheDir
+        self.source = inspect.getsource(function)
+        self.values = None
+        self.nodesKey = None
+        self.index = {}
+
+    def key(self, X):
+        sha = hashlib.sha1(self.source.encode())
+        sha.update(np.ascontiguousarray(X[:2], dtype='d').tobytes())
+        return sha.hexdigest()
+
+    def nodal(self, X):
+        """
+        Bathymetry at the mesh nodes X[:, i], from the cache when possible;
+        the node table is built by the first call and later calls on other
+        points are only evaluated
+        """
+        X = np.asarray(X, dtype='d')
+        key = self.key(X)
+        if self.values is not None:
+            return self.values if key == self.nodesKey else self.evaluate(X)
+        path = os.path.join(self.cacheDir, key + '.npy')
+        if os.path.exists(path):
+            values = np.load(path)
+        else:
+            values = self.evaluate(X)
+            if not os.path.isdir(self.cacheDir):
+                os.makedirs(self.cacheDir, exist_ok=True)
+            tmp = path + '.%d.tmp' % os.getpid()
+            with open(tmp, 'wb') as f:
+                np.save(f, values)
+            os.replace(tmp, path)
+        self.nodesKey = key
+        self.values = values
+        self.index = dict(zip(zip(X[0].tolist(), X[1].tolist()), range(len(values))))
+        return values
+
+    def evaluate(self, X):
+        """The function at the points X[:, i], without the cache"""
+        X = np.asarray(X, dtype='d')
+        return np.broadcast_to(np.asarray(self.function(X), dtype='d'), X.shape[1:]).copy()
+
+    def __call__(self, X):
+        if np.ndim(X[0]) == 0:
+            i = self.index.get((float(X[0]), float(X[1])))
+            if i is not None:
+                return self.values[i]
+            return self.function(X)
+        return self.nodal(X)
@@ -0,0 +1,104 @@
+"""
+Boundary conditions declared as a table instead of flag chains.
+
+Each entry of the table maps boundary tag names (a name, a tuple of names,
+or raw integer flags such as 0) to a constant, a function of (x, t), or
+None for no condition; 'default' covers all the other flags:
+
+    noSlip = ('box_left', 'box_right', 'box_top', 'box_front', 'box_back')
+    bcTable = BoundaryConditionTable(boundaryTags, {
+        'vel_u_DBC': {noSlip: 0.0},
+        'vel_u_AFBC': {noSlip: None, 'top': None, 'default': 0.0},
+        'vof_DFBC': {}})
+    boundaryConditions = bcTable.boundaryConditions()
+
+The table replaces the if/elif chains over the flags of the case files and
+is compiled once into flag-indexed lists, with one shared function per
+constant value. It is a readability change: proteus still calls the
+condition of each boundary DOF separately at every step, so the cost per
+step is the same as with the chains.
+"""
+
+def constant(value):
+    """Boundary condition function (x, t) -> value"""
+    def bc(x, t):
+        return value
+    bc.value = value
+    return bc
+
+class BoundaryConditionTable(object):
+    def __init__(self, boundaryTags, table):
+        self.boundaryTags = boundaryTags
+        self.nFlags = max(list(boundaryTags.values()) + [0]) + 1
+        self.functions = {}
+        constants = {}
+        for key, entries in table.items():
+            entries = dict(entries)
+            default = self._function(entries.pop('default', None), constants)
+            # the last slot holds the default for flags outside the table
+            byFlag = [default]*(self.nFlags + 1)
+            for tags, value in entries.items():
+                for flag in self._flags(tags):
+                    byFlag[flag] = self._function(value, constants)
+            self.functions[key] = byFlag
+
+    def _flags(self, tags):
+        if not isinstance(tags, tuple):
+            tags = (tags,)
+        return [tag if isinstance(tag, int) else self.boundaryTags[tag] for tag in tags]
+
+    def _function(self, value, constants):
+        if value is None or callable(value):
+            return value
+        if value not in constants:
+            constants[value] = constant(value)
+        return constants[value]
+
+    def dispatcher(self, key):
+        """The (x, flag) function proteus expects for key"""
+        byFlag = self.functions[key]
+        n = self.nFlags
+        def bc(x, flag):
+            if 0 <= flag < n:
+                return byFlag[flag]
+            return byFlag[n]
+        return bc
+
+    def boundaryConditions(self):
+        """Dictionary of (x, flag) functions for TwoPhaseFlowProblem"""
+        return dict((key, self.dispatcher(key)) for key in self.functions)
+
+class SeparableBC(object):
+    """
+    Boundary condition space(x)*time(t), or space(x) alone if time is None
+
+    The spatial factor is computed once per boundary point and cached, so
+    each step only evaluates time(t), once per time level.
+    """
+    def __init__(self, space, time=None, scale=1.0, cache=None):
+        self.space = space
+        self.time = time
+        self.scale = scale
+        self.cache = {} if cache is None else cache
+        self.t = None
+
+    def spatial(self, x):
+        key = tuple(x.tolist()) if hasattr(x, 'tolist') else tuple(x)
+        try:
+            return self.cache[key]
+        except KeyError:
+            value = self.cache[key] = self.space(x)
+            return value
+
+    def temporal(self, t):
+        if t != self.t:
+            self.t = t
+            self.timeValue = self.scale*(1.0 if self.time is None else self.time(t))
+        return self.timeValue
+
+    def __call__(self, x, t):
+        return self.spatial(x)*self.temporal(t)
+
+    def scaled(self, scale):
+        """The same condition times scale, sharing the cached spatial factors"""
+        return SeparableBC(self.space, self.time, self.scale*scale, self.cache)
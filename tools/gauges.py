@@ -0,0 +1,303 @@
+"""
+Virtual gauges evaluated after the run from a saved HDF5 archive.
+
+PointGauges and LineGauges take the same gauges/fileName/activeTime/
+sampleRate arguments as proteus.Gauges.PointGauges and LineGauges, so a
+case can keep a single gauge specification and either attach the proteus
+gauges to the models or skip them and evaluate these afterwards with
+
+    gauges.evaluate('data/marin.h5')
+
+The gauge points (and the points where gauge lines cross element faces)
+are located in the mesh once, through a bin grid over the element bounding
+boxes (tools.spatial_index); the interpolation weights are kept as a
+sparse matrix and reused for every saved step, reading only the nodal
+values they need. The CSV files have the same layout as the ones written
+by the live gauges.
+"""
+import numpy as np
+from .archive import ArchiveReader
+from .spatial_index import BinGrid
+
+class SimplexMesh(object):
+    """
+    Triangle or tetrahedron mesh with the affine maps needed for point location.
+    """
+    def __init__(self, nodes, elements):
+        self.elements = np.asarray(elements, dtype='i')
+        self.nd = self.elements.shape[1] - 1
+        self.nodes = np.asarray(nodes)[:,:self.nd]
+        X = self.nodes[self.elements]
+        self.origin = X[:,0]
+        # rows of inverseJacobian map x - origin to barycentric coordinates 1..nd
+        self.inverseJacobian = np.linalg.inv(np.transpose(X[:,1:] - X[:,:1], (0, 2, 1)))
+        self.index = BinGrid(self.nodes, self.elements)
+
+    def barycentric(self, elements, x):
+        """Barycentric coordinates of points x (one per element) in elements"""
+        lam = np.einsum('nij,nj->ni', self.inverseJacobian[elements], x - self.origin[elements])
+        return np.column_stack((1.0 - lam.sum(1), lam))
+
+    def candidates(self, lo, hi):
+        """Elements whose bounding box overlaps the box [lo, hi]"""
+        elements = self.index.box_candidates(lo, hi)
+        X = self.nodes[self.elements[elements]]
+        return elements[np.all((X.min(1) <= hi) & (X.max(1) >= lo), axis=1)]
+
+    def locate(self, points, tol=1.0e-10):
+        """Element containing each point (-1 if outside) and its barycentric coordinates"""
+        points = np.atleast_2d(points)[:,:self.nd]
+        found = -np.ones(len(points), dtype='i')
+        weights = np.zeros((len(points), self.nd + 1))
+        point, candidates = self.index.candidates(points)
+        lam = self.barycentric(candidates, points[point])
+        inside = np.flatnonzero(lam.min(1) >= -tol)
+        # keep the first containing element of each point
+        first = inside[np.unique(point[inside], return_index=True)[1]]
+        found[point[first]] = candidates[first]
+        weights[point[first]] = lam[first]
+        return found, weights
+
+    def intersect(self, a, b, tol=1.0e-10):
+        """
+        Points where the segment a-b enters and leaves the elements it crosses,
+        as sorted, unique parameters s in [0, 1] along the segment.
+        """
+        a = np.asarray(a, dtype='d')[:self.nd]
+        b = np.asarray(b, dtype='d')[:self.nd]
+        candidates = self.candidates(np.minimum(a, b), np.maximum(a, b))
+        lam_a = self.barycentric(candidates, np.tile(a, (len(candidates), 1)))
+        lam_b = self.barycentric(candidates, np.tile(b, (len(candidates), 1)))
+        # lam(s) = lam_a + s*(lam_b - lam_a) >= 0 clips [0, 1] per face
+        d = lam_b - lam_a
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s = -lam_a/d
+        s_in = np.where(d > 0, s, 0.0).max(1).clip(0.0, 1.0)
+        s_out = np.where(d < 0, s, 1.0).min(1).clip(0.0, 1.0)
+        parallel_outside = ((d == 0) & (lam_a < -tol)).any(1)
+        hit = (s_in <= s_out + tol) & ~parallel_outside
+        s = np.unique(np.round(np.concatenate((s_in[hit], s_out[hit])), 12))
+        return a + np.outer(s, b - a)
+
+def _field_points(gauges):
+    """(field, point) pairs of a PointGauges specification, in output order"""
+    pairs = []
+    for fields, points in gauges:
+        if isinstance(fields, str):
+            fields = (fields,)
+        for field in fields:
+            for point in points:
+                pairs.append((field, tuple(point)))
+    return pairs
+
+def _header(columns):
+    """Gauge file header in the proteus layout"""
+    return "%10s" % ('time',) + "".join(",%12s [%9.5g %9.5g %9.5g]" % ((field,) + tuple(point) + (0.0,)*(3-len(point)))
+                                        for field, point in columns) + "\n"
+
+class _ArchiveGauges(object):
+    """
+    Gauges evaluated from an archive; the subclasses give the output columns
+    through columns(mesh), a list of (field, point) pairs
+    """
+    def __init__(self, gauges, activeTime=None, sampleRate=0, fileName='gauges.csv',
+                 fieldMap=None):
+        self.gauges = gauges
+        self.activeTime = activeTime
+        self.sampleRate = sampleRate
+        self.fileName = fileName
+        self.fieldMap = fieldMap or {}
+
+    def setup(self, archive, step=0):
+        from scipy.sparse import csr_matrix
+        mesh = SimplexMesh(archive.nodes(step), archive.elements(step))
+        self.columns_ = self.columns(mesh)
+        points = np.array([tuple(point[:mesh.nd]) for field, point in self.columns_], dtype='d')
+        elements, weights = mesh.locate(points)
+        if (elements < 0).any():
+            missing = points[elements < 0]
+            raise ValueError("gauge points outside the mesh: {0}".format(missing.tolist()))
+        nodes = mesh.elements[elements]
+        # only these nodal values are read from each step
+        self.rows, local = np.unique(nodes.ravel(), return_inverse=True)
+        self.weights = csr_matrix((weights.ravel(),
+                                   (np.repeat(np.arange(len(points)), mesh.nd + 1), local.ravel())),
+                                  shape=(len(points), len(self.rows)))
+        self.fields = sorted(set(field for field, point in self.columns_))
+
+    def evaluate(self, h5, times=None):
+        """Write fileName with the gauge values at every saved step of h5"""
+        with ArchiveReader(h5, mmap=True) as archive:
+            self.setup(archive)
+            if times is None:
+                try:
+                    times = archive.times
+                except IOError:
+                    times = list(range(archive.nSteps))
+            names = [self.fieldMap.get(field, field) for field in self.fields]
+            columnField = np.array([self.fields.index(field) for field, point in self.columns_])
+            columnIndex = np.arange(len(self.columns_))
+            lastTime = None
+            with open(self.fileName, 'w') as f:
+                f.write(_header(self.columns_))
+                for step, values in archive.iter_steps(names, rows=self.rows):
+                    t = times[step]
+                    if self.activeTime is not None and not (self.activeTime[0] <= t <= self.activeTime[1]):
+                        continue
+                    if lastTime is not None and t - lastTime < self.sampleRate:
+                        continue
+                    lastTime = t
+                    nodal = np.column_stack([values[name] for name in names])
+                    row = (self.weights @ nodal)[columnIndex, columnField]
+                    f.write("%10.4e" % t + "".join(", %43.18e" % v for v in row) + "\n")
+
+class PointGauges(_ArchiveGauges):
+    """
+    Post-hoc counterpart of proteus.Gauges.PointGauges
+
+    gauges is the same (((field, ...), ((x, y, z), ...)), ...) tuple.
+    fieldMap maps gauge field names to archive field names where they differ.
+    """
+    def columns(self, mesh):
+        return _field_points(self.gauges)
+
+class LineGauges(_ArchiveGauges):
+    """
+    Post-hoc counterpart of proteus.Gauges.LineGauges
+
+    gauges is the same (((field, ...), (((x0, y0, z0), (x1, y1, z1)), ...)), ...)
+    tuple. As with the live gauges, each line is sampled where it enters and
+    leaves the elements it crosses.
+    """
+    def columns(self, mesh):
+        columns = []
+        for fields, lines in self.gauges:
+            if isinstance(fields, str):
+                fields = (fields,)
+            for field in fields:
+                for a, b in lines:
+                    columns += [(field, tuple(point)) for point in mesh.intersect(a, b)]
+        return columns
+
+class BufferedPointGauges(object):
+    """
+    Point gauges sampled during the run without a collective per sample
+
+    Drop-in auxiliary variable for proteus.Gauges.PointGauges on P1 fields;
+    attachModel raises ValueError for other elements. Each rank interpolates
+    the probes inside its owned elements and keeps the samples; every
+    batchSize samples the ranks send them to the master in a single gather
+    and the master appends them to fileName. The file holds the usual gauge
+    header line followed by float64 rows (time, values...), see
+    read_buffered_gauges.
+
+    The gather is collective, so the last partial batch is written from
+    calculate at the step that reaches the end of activeTime or finalTime,
+    which every rank takes; one of them is required. Samples still buffered
+    when a run stops early are lost. comm is the mpi4py communicator, by
+    default proteus' own.
+    """
+    def __init__(self, gauges, fileName='gauges.bin', activeTime=None, sampleRate=0,
+                 batchSize=100, finalTime=None, comm=None):
+        if finalTime is None and activeTime is None:
+            raise ValueError("BufferedPointGauges needs finalTime or activeTime to write its last samples")
+        self.columns = _field_points(gauges)
+        self.fileName = fileName
+        self.activeTime = activeTime
+        self.sampleRate = sampleRate
+        self.batchSize = batchSize
+        self.finalTime = finalTime
+        self.comm = comm
+        self.times = []
+        self.samples = []
+        self.lastTime = None
+
+    def attachModel(self, model, ar):
+        if self.comm is None:
+            from proteus import Comm
+            self.comm = Comm.get().comm.tompi4py()
+        self.model = model
+        lm = model.levelModelList[-1]
+        owned = lm.mesh.elementNodesArray[:lm.mesh.nElements_owned]
+        mesh = SimplexMesh(lm.mesh.nodeArray, owned)
+        points = np.array([point[:mesh.nd] for field, point in self.columns], dtype='d')
+        found, weights = mesh.locate(points)
+        # probes on partition boundaries belong to the lowest rank holding them
+        holders = np.array(self.comm.allgather(found >= 0))
+        if not holders.any(0).all():
+            missing = points[~holders.any(0)]
+            raise ValueError("gauge points outside the mesh: {0}".format(missing.tolist()))
+        mine = holders.argmax(0) == self.comm.rank
+        self.local = np.flatnonzero(mine)
+        self.weights = weights[mine]
+        self.dofs = []
+        for i in self.local:
+            field = self.columns[i][0]
+            u = lm.u[lm.coefficients.variableNames.index(field)]
+            if u.femSpace.dofMap.l2g.shape[1] != mesh.nd + 1:
+                raise ValueError("BufferedPointGauges only interpolates P1 fields, not {0}".format(field))
+            self.dofs.append((u, u.femSpace.dofMap.l2g[found[i], :mesh.nd + 1]))
+        return self
+
+    def attachAuxiliaryVariables(self, avDict):
+        pass
+
+    def calculate_init(self):
+        if self.comm.rank == 0:
+            with open(self.fileName, 'w') as f:
+                f.write(_header(self.columns))
+        self.calculate()
+
+    def end(self):
+        """Time after which no more samples are taken"""
+        return min(time for time in (self.finalTime, self.activeTime and self.activeTime[1]) if time is not None)
+
+    def calculate(self):
+        t = self.model.stepController.t_model_last
+        active = self.activeTime is None or self.activeTime[0] <= t <= self.activeTime[1]
+        if active and (self.lastTime is None or t - self.lastTime >= self.sampleRate):
+            self.lastTime = t
+            self.times.append(t)
+            self.samples.append([np.dot(w, u.dof[dofs]) for w, (u, dofs) in zip(self.weights, self.dofs)])
+        # every rank holds the same times, so they all take part in the gather
+        end = self.end()
+        if self.times and (len(self.times) >= self.batchSize or t >= end - 1e-12*max(abs(end), 1.0)):
+            self.flush()
+
+    def flush(self):
+        """Gather the buffered samples on the master and append them to fileName"""
+        batch = self.comm.gather((self.local, np.array(self.samples, dtype='d').reshape(len(self.times), -1)), root=0)
+        if self.comm.rank == 0 and self.times:
+            rows = np.empty((len(self.times), len(self.columns) + 1))
+            rows[:,0] = self.times
+            for local, samples in batch:
+                rows[:,local + 1] = samples
+            with open(self.fileName, 'ab') as f:
+                rows.tofile(f)
+        self.times = []
+        self.samples = []
+
+def read_buffered_gauges(fileName):
+    """Header line and (nSamples, 1 + nColumns) array of a BufferedPointGauges file"""
+    with open(fileName, 'rb') as f:
+        header = f.readline().decode()
+        data = np.fromfile(f, dtype='d')
+    return header, data.reshape(-1, header.count('[') + 1)
+
+def benchmark_locate(h5, nProbes=10000, seed=0):
+    """Time locating nProbes random points in the mesh of h5"""
+    import time
+    with ArchiveReader(h5) as archive:
+        nodes, elements = archive.nodes(0), archive.elements(0)
+    start = time.time()
+    mesh = SimplexMesh(nodes, elements)
+    setup = time.time() - start
+    lo, hi = mesh.nodes.min(0), mesh.nodes.max(0)
+    probes = lo + (hi - lo)*np.random.RandomState(seed).rand(nProbes, mesh.nd)
+    start = time.time()
+    found, weights = mesh.locate(probes)
+    elapsed = time.time() - start
+    print("{0} elements, index built in {1:.3f} s".format(len(elements), setup))
+    print("located {0} of {1} probes in {2:.3f} s ({3:.1f} probes/ms)".format(
+        (found >= 0).sum(), nProbes, elapsed, nProbes/elapsed/1000.0))
+    return elapsed
@@ -0,0 +1,228 @@
+"""
+Single-pass conversion of gmsh tetrahedral meshes to TetGen files.
+
+The usual route is gmsh -> msh2 text -> mt.msh2simplex -> TetGen text ->
+tetgen -Vfeen -> five mv's. convert() instead meshes the .geo through the
+gmsh Python API (or reads a msh2 file when the API is not installed),
+computes the faces, edges and neighbors with NumPy and writes the
+.node/.ele/.face/.edge/.neigh files proteus loads, together with a binary
+copy of the same arrays in <filebase>.mesh.npz for post-processing tools,
+logging the time spent in each stage:
+
+    from proteus import Profiling
+    convert("dtmb", he=0.1, log=Profiling.logEvent, nThreads=44)
+
+With nThreads > 1 gmsh meshes the volume with its parallel Delaunay
+algorithm (HXT) on that many threads. That only pays in the separate
+genmesh step on a full node (aprun -n 1 -d 44 with OMP_NUM_THREADS=44);
+inside a run the master's node is busy with the other ranks, so the cases
+mesh there on one thread.
+
+Flags follow msh2simplex: tetrahedra carry the physical tag of their volume,
+boundary faces the physical tag of their surface, and edges and nodes on a
+tagged boundary face carry its tag; everything else is 0.
+"""
+import os
+import time
+from subprocess import check_call
+import numpy as np
+
+# face i and the edges of a tetrahedron, face i opposite vertex i as in TetGen
+tet_faces = np.array([[1, 2, 3], [0, 2, 3], [0, 1, 3], [0, 1, 2]])
+tet_edges = np.array([[0, 1], [0, 2], [0, 3], [1, 2], [1, 3], [2, 3]])
+
+class SimplexMesh3D(object):
+    """Arrays of a tetrahedral mesh, 0-based"""
+    def __init__(self, nodes, elements, elementFlags, triangles, triangleFlags):
+        self.nodes = nodes
+        self.elements = elements
+        self.elementFlags = elementFlags
+        self.triangles = triangles
+        self.triangleFlags = triangleFlags
+
+def mesh_geo(geofile, he, nThreads=1):
+    """Mesh geofile with the gmsh Python API, clmax = he"""
+    import gmsh
+    gmsh.initialize()
+    try:
+        gmsh.option.setNumber("General.Terminal", 1)
+        gmsh.open(geofile)
+        gmsh.option.setNumber("Mesh.CharacteristicLengthMax", he)
+        gmsh.option.setNumber("General.NumThreads", nThreads)
+        if nThreads > 1:
+            gmsh.option.setNumber("Mesh.Algorithm3D", 10)
+        gmsh.model.mesh.generate(3)
+        tags, coords, _ = gmsh.model.mesh.getNodes()
+        index = np.zeros(int(tags.max()) + 1, dtype=np.int64)
+        index[tags.astype(np.int64)] = np.arange(len(tags))
+
+        def physical(dim, elementType, nVertices):
+            blocks, flags = [], []
+            groups = gmsh.model.getPhysicalGroups(dim)
+            entities = [(tag, entity) for d, tag in groups
+                        for entity in gmsh.model.getEntitiesForPhysicalGroup(d, tag)]
+            if not groups:
+                entities = [(0, entity) for d, entity in gmsh.model.getEntities(dim)]
+            for tag, entity in entities:
+                types, _, nodeTags = gmsh.model.mesh.getElements(dim, entity)
+                for elementTypeFound, connectivity in zip(types, nodeTags):
+                    if elementTypeFound == elementType:
+                        block = index[np.asarray(connectivity, dtype=np.int64)].reshape(-1, nVertices)
+                        blocks.append(block)
+                        flags.append(np.full(len(block), tag, dtype=np.int64))
+            if not blocks:
+                return np.zeros((0, nVertices), dtype=np.int64), np.zeros(0, dtype=np.int64)
+            return np.concatenate(blocks), np.concatenate(flags)
+
+        elements, elementFlags = physical(3, 4, 4)
+        triangles, triangleFlags = physical(2, 2, 3)
+        return SimplexMesh3D(coords.reshape(-1, 3), elements, elementFlags, triangles, triangleFlags)
+    finally:
+        gmsh.finalize()
+
+def read_msh2(mshfile):
+    """Tetrahedra and triangles of a gmsh msh2 text file"""
+    with open(mshfile) as f:
+        text = f.read()
+    nodeText = text.split("$Nodes")[1].split("$EndNodes")[0].split("\n", 2)[2]
+    nodeTable = np.array(nodeText.split(), dtype='d').reshape(-1, 4)
+    index = np.zeros(int(nodeTable[:, 0].max()) + 1, dtype=np.int64)
+    index[nodeTable[:, 0].astype(np.int64)] = np.arange(len(nodeTable))
+    found = {4: [], 2: []}
+    for line in text.split("$Elements")[1].split("$EndElements")[0].split("\n")[2:]:
+        # id type nTags physical elementary ... vertices
+        row = line.split()
+        if len(row) > 3 and row[1] in ('2', '4'):
+            nTags = int(row[2])
+            found[int(row[1])].append([int(row[3]) if nTags else 0] + [int(v) for v in row[3 + nTags:]])
+    tets = np.array(found[4], dtype=np.int64).reshape(-1, 5)
+    tris = np.array(found[2], dtype=np.int64).reshape(-1, 4)
+    return SimplexMesh3D(nodeTable[:, 1:], index[tets[:, 1:]], tets[:, 0], index[tris[:, 1:]], tris[:, 0])
+
+def _unique_rows(rows, nNodes):
+    """
+    The distinct rows of vertex numbers below nNodes, each sorted, in
+    lexicographic order, and the index among them of every row
+    """
+    rows = np.sort(rows, axis=1)
+    # the sorted rows packed into as few 64-bit integers as hold them
+    keys = [rows[:, 0].astype(np.int64)]
+    span = nNodes
+    for j in range(1, rows.shape[1]):
+        if span*nNodes < 2**63:
+            keys[-1] = keys[-1]*nNodes + rows[:, j]
+            span *= nNodes
+        else:
+            keys.append(rows[:, j].astype(np.int64))
+            span = nNodes
+    order = np.lexsort(keys[::-1])
+    new = np.zeros(len(rows), dtype=bool)
+    new[:1] = True
+    for key in keys:
+        key = key[order]
+        new[1:] |= key[1:] != key[:-1]
+    inverse = np.empty(len(rows), dtype=np.int64)
+    inverse[order] = np.cumsum(new) - 1
+    return rows[order[new]], inverse
+
+def _find_rows(table, rows, nNodes):
+    """Index in the unique sorted rows of table of each row, or -1"""
+    merged, inverse = _unique_rows(np.concatenate([table, rows]), nNodes)
+    position = np.full(len(merged), -1, dtype=np.int64)
+    position[inverse[:len(table)]] = np.arange(len(table))
+    return position[inverse[len(table):]]
+
+def connectivity(mesh):
+    """Faces, edges, neighbors and their flags, as tetgen -feen gives them"""
+    nNodes = len(mesh.nodes)
+    nElements = len(mesh.elements)
+    mesh.faces, inverse = _unique_rows(mesh.elements[:, tet_faces].reshape(-1, 3), nNodes)
+    # the two slots of an interior face are adjacent once sorted by face
+    order = np.argsort(inverse, kind='stable')
+    shared = np.flatnonzero(inverse[order][1:] == inverse[order][:-1])
+    a, b = order[shared], order[shared + 1]
+    neighbors = np.full(4*nElements, -1, dtype=np.int64)
+    neighbors[a] = b//4
+    neighbors[b] = a//4
+    mesh.neighbors = neighbors.reshape(-1, 4)
+    mesh.faceFlags = np.zeros(len(mesh.faces), dtype=np.int64)
+    at = _find_rows(mesh.faces, mesh.triangles, nNodes)
+    found = at >= 0
+    mesh.faceFlags[at[found]] = mesh.triangleFlags[found]
+    mesh.edges, _ = _unique_rows(mesh.elements[:, tet_edges].reshape(-1, 2), nNodes)
+    tagged = np.flatnonzero(mesh.faceFlags)
+    taggedEdges = mesh.faces[tagged][:, [[0, 1], [0, 2], [1, 2]]].reshape(-1, 2)
+    mesh.edgeFlags = np.zeros(len(mesh.edges), dtype=np.int64)
+    np.maximum.at(mesh.edgeFlags, _find_rows(mesh.edges, taggedEdges, nNodes), np.repeat(mesh.faceFlags[tagged], 3))
+    mesh.nodeFlags = np.zeros(nNodes, dtype=np.int64)
+    np.maximum.at(mesh.nodeFlags, mesh.faces[tagged].ravel(), np.repeat(mesh.faceFlags[tagged], 3))
+    return mesh
+
+def _write_table(fileName, header, table, fmt, chunk=100000):
+    """TetGen table with 1-based row numbers in front of each row"""
+    with open(fileName, 'w') as f:
+        f.write(header + "\n")
+        line = "%d " + fmt + "\n"
+        for start in range(0, len(table), chunk):
+            block = table[start:start + chunk]
+            rows = np.column_stack([np.arange(start + 1, start + len(block) + 1), block])
+            f.write((line*len(block)) % tuple(rows.ravel().tolist()))
+
+def write_tetgen(filebase, mesh):
+    """<filebase>.node/.ele/.face/.edge/.neigh, base 1"""
+    nodes = np.column_stack([mesh.nodes, mesh.nodeFlags])
+    _write_table(filebase + ".node", "%d 3 0 1" % len(nodes), nodes, "%.16e %.16e %.16e %d")
+    _write_table(filebase + ".ele", "%d 4 1" % len(mesh.elements),
+                 np.column_stack([mesh.elements + 1, mesh.elementFlags]), "%d %d %d %d %d")
+    _write_table(filebase + ".face", "%d 1" % len(mesh.faces),
+                 np.column_stack([mesh.faces + 1, mesh.faceFlags]), "%d %d %d %d")
+    _write_table(filebase + ".edge", "%d 1" % len(mesh.edges),
+                 np.column_stack([mesh.edges + 1, mesh.edgeFlags]), "%d %d %d")
+    _write_table(filebase + ".neigh", "%d 4" % len(mesh.neighbors),
+                 np.where(mesh.neighbors >= 0, mesh.neighbors + 1, -1), "%d %d %d %d")
+
+arrays = ('nodes', 'nodeFlags', 'elements', 'elementFlags', 'faces', 'faceFlags',
+          'edges', 'edgeFlags', 'neighbors')
+
+def save_mesh(filebase, mesh):
+    np.savez(filebase + ".mesh.npz", **dict((name, getattr(mesh, name)) for name in arrays))
+
+def load_mesh(filebase):
+    """The arrays written by save_mesh, 0-based"""
+    with np.load(filebase + ".mesh.npz") as data:
+        mesh = SimplexMesh3D(data['nodes'], data['elements'], data['elementFlags'], None, None)
+        for name in arrays:
+            setattr(mesh, name, data[name])
+    return mesh
+
+def default_threads():
+    """OMP_NUM_THREADS, or 1 when it is unset or not a single integer"""
+    try:
+        return max(int(os.environ.get('OMP_NUM_THREADS', '1')), 1)
+    except ValueError:
+        return 1
+
+def convert(filebase, he, log=print, nThreads=1):
+    """Mesh <filebase>.geo and write the TetGen and binary files, returning the stage timings"""
+    timings = {}
+    start = time.time()
+    try:
+        mesh = mesh_geo(filebase + ".geo", he, nThreads)
+    except ImportError:
+        log("gmsh Python API not found, reading msh2 from the gmsh executable")
+        check_call("gmsh {0:s} -v 10 -3 -o {1:s} -format msh2 -clmax {2:e} -nt {3:d}{4:s}".format(
+            filebase + ".geo", filebase + ".msh", he, nThreads, " -algo hxt" if nThreads > 1 else ""),
+            shell=True)
+        mesh = read_msh2(filebase + ".msh")
+    timings['gmsh'] = time.time() - start
+    for stage, work in (('connectivity', lambda: connectivity(mesh)),
+                        ('tetgen files', lambda: write_tetgen(filebase, mesh)),
+                        ('binary', lambda: save_mesh(filebase, mesh))):
+        start = time.time()
+        work()
+        timings[stage] = time.time() - start
+    log("{0} nodes, {1} tetrahedra, {2} faces, {3} edges, {4} gmsh threads".format(
+        len(mesh.nodes), len(mesh.elements), len(mesh.faces), len(mesh.edges), nThreads))
+    for stage in ('gmsh', 'connectivity', 'tetgen files', 'binary'):
+        log("{0:>12s}: {1:8.3f} s".format(stage, timings[stage]))
+    return timings
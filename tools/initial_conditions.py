@@ -0,0 +1,76 @@
+"""
+Array-level initial conditions.
+
+Besides the scalar uOfXT(x, t), an initial-condition class in a case file
+can define uOfXT_batch(X, t) that evaluates all the points X[:, :3] in one
+NumPy call. uOfXT_batch below prefers that method and falls back to
+calling uOfXT point by point.
+
+proteus sets a model's initial conditions by calling uOfXT once per
+interpolation point, each point a row of the array of interpolation points
+of the finite element space. TabulatedIC evaluates that whole array with a
+single uOfXT_batch call on the first of these calls, so the rest are table
+lookups. tabulate wraps every initial condition of a dict that has a batch
+form and leaves the others to their uOfXT:
+
+    m['vof'].p.initialConditions['vof'] = VOFIC(waterColumn, eps=1.5*he)
+    ...
+    for model in m.values():
+        tabulate(model.p.initialConditions)
+"""
+import numpy as np
+
+def uOfXT_batch(ic, X, t):
+    """Values of the initial condition ic at the points X[:, :3]"""
+    X = np.asarray(X, dtype='d').reshape(-1, 3)
+    if hasattr(ic, 'uOfXT_batch'):
+        return np.broadcast_to(np.asarray(ic.uOfXT_batch(X, t), dtype='d'), (len(X),))
+    return np.array([ic.uOfXT(x, t) for x in X], dtype='d')
+
+class TabulatedIC(object):
+    """
+    ic evaluated at once on the array each point passed to uOfXT is a row of.
+
+    The table is keyed by the bytes of the points and rebuilt for a new
+    array or a new t; points not in it go to ic.uOfXT.
+    """
+    def __init__(self, ic):
+        self.ic = ic
+        self.points = None
+        self.t = None
+        self.table = {}
+
+    def _tabulate(self, points, t):
+        self.points = points
+        self.t = t
+        self.table = {}
+        if isinstance(points, np.ndarray) and points.dtype == np.float64 and points.size % 3 == 0:
+            X = np.ascontiguousarray(points).reshape(-1, 3)
+            self.table = dict(zip(X.view('V24').ravel().tolist(), uOfXT_batch(self.ic, X, t).tolist()))
+
+    def uOfXT(self, x, t, *args):
+        points = getattr(x, 'base', None)
+        if points is not self.points or t != self.t:
+            self._tabulate(points, t)
+        try:
+            return self.table[np.ascontiguousarray(x, dtype='d').tobytes()]
+        except KeyError:
+            return self.ic.uOfXT(x, t)
+
+    def uOfXT_batch(self, X, t):
+        return uOfXT_batch(self.ic, X, t)
+
+def tabulate(initialConditions):
+    """Wrap the entries of the dict initialConditions that have uOfXT_batch in TabulatedIC"""
+    for name, ic in initialConditions.items():
+        if hasattr(ic, 'uOfXT_batch') and not isinstance(ic, TabulatedIC):
+            initialConditions[name] = TabulatedIC(ic)
+    return initialConditions
+
+def smoothed_heaviside(eps, phi):
+    """Array version of proteus.ctransportCoefficients.smoothedHeaviside"""
+    phi = np.asarray(phi, dtype='d')
+    if eps == 0.0:
+        return np.where(phi > 0.0, 1.0, np.where(phi < 0.0, 0.0, 0.5))
+    H = 0.5*(1.0 + phi/eps + np.sin(np.pi*phi/eps)/np.pi)
+    return np.where(phi > eps, 1.0, np.where(phi < -eps, 0.0, H))
@@ -0,0 +1,87 @@
+"""
+Content-addressed cache of Triangle and TetGen meshes.
+
+With domain.MeshOptions.genMesh set, proteus runs triangle (or tetgen) on the
+.poly file of the domain at every launch; with it unset it reads the
+.node/.ele/... files next to the .poly as they are. cached_mesh keys the
+mesh by a hash of the PSLG or PLC (vertices, segments or facets, flags,
+regions, holes), he and the mesher options. On a hit it copies the stored
+files next to the .poly and turns genMesh off; on a miss the master runs the
+mesher once, with the command proteus uses, and stores its output first:
+
+    domain.MeshOptions.he = opts.he
+    st.assembleDomain(domain)
+    domain.MeshOptions.triangleOptions = "VApq30Dena%8.8f" % ((opts.he ** 2)/2.0,)
+    cached_mesh(domain, "mesh")
+
+Clear cacheDir after updating triangle or tetgen.
+"""
+import hashlib
+import json
+import os
+import shutil
+from subprocess import check_call
+import numpy as np
+
+geometry = ('vertices', 'vertexFlags', 'segments', 'segmentFlags', 'facets', 'facetFlags',
+            'regions', 'regionFlags', 'regionConstraints', 'holes', 'holes_ind')
+extensions = ('node', 'ele', 'edge', 'face', 'neigh')
+
+def mesh_key(domain, options):
+    """sha1 of the geometry of domain, its he and the mesher options"""
+    description = dict((name, getattr(domain, name, None)) for name in geometry)
+    description['nd'] = domain.nd
+    description['he'] = getattr(domain.MeshOptions, 'he', None)
+    description['options'] = options
+    text = json.dumps(description, sort_keys=True, default=lambda a: np.asarray(a).tolist())
+    return hashlib.sha1(text.encode()).hexdigest()
+
+def run_mesher(fileprefix, nd, options):
+    """triangle or tetgen on fileprefix.poly, output renamed to fileprefix.<ext>"""
+    if nd == 2:
+        check_call("triangle -{0} -e {1}.poly".format(options, fileprefix), shell=True)
+    else:
+        check_call("tetgen -{0} {1}.poly".format(options, fileprefix), shell=True)
+    for ext in extensions:
+        if os.path.exists("{0}.1.{1}".format(fileprefix, ext)):
+            os.replace("{0}.1.{1}".format(fileprefix, ext), "{0}.{1}".format(fileprefix, ext))
+
+def cached_mesh(domain, fileprefix="mesh", options=None, cacheDir="mesh_cache", comm=None):
+    """
+    Write fileprefix.poly and the matching cached mesh files, meshing on a
+    miss, and make proteus read them instead of meshing again
+    """
+    if comm is None:
+        from proteus import Comm
+        comm = Comm.get()
+    options = domain.MeshOptions.triangleOptions if options is None else options
+    if not options:
+        raise ValueError("set domain.MeshOptions.triangleOptions before cached_mesh")
+    path = os.path.join(os.path.abspath(cacheDir), mesh_key(domain, options))
+    if comm.isMaster():
+        domain.writePoly(fileprefix)
+        # no mesh files left over from another geometry
+        for ext in extensions:
+            if os.path.exists("{0}.{1}".format(fileprefix, ext)):
+                os.remove("{0}.{1}".format(fileprefix, ext))
+        if not os.path.isdir(path):
+            run_mesher(fileprefix, domain.nd, options)
+            tmp = path + '.%d.tmp' % os.getpid()
+            os.makedirs(tmp, exist_ok=True)
+            for ext in extensions:
+                if os.path.exists("{0}.{1}".format(fileprefix, ext)):
+                    shutil.copy("{0}.{1}".format(fileprefix, ext), os.path.join(tmp, "mesh." + ext))
+            try:
+                os.rename(tmp, path)
+            except OSError:
+                # another job stored the same mesh first
+                shutil.rmtree(tmp)
+        else:
+            for ext in extensions:
+                if os.path.exists(os.path.join(path, "mesh." + ext)):
+                    shutil.copy(os.path.join(path, "mesh." + ext), "{0}.{1}".format(fileprefix, ext))
+    else:
+        domain.polyfile = fileprefix
+    comm.barrier()
+    domain.MeshOptions.genMesh = False
+    return path
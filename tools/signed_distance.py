@@ -0,0 +1,188 @@
+"""
+Signed distances for the usual initial free surfaces, and the matching
+level-set, VOF and hydrostatic pressure initial conditions.
+
+Every shape can be evaluated at a single point, shape(x), which is what
+proteus calls for each interpolation point, or at an array of points,
+shape.batch(X) with X of shape (n, 3). Distances are negative inside the
+shape (in the water). For example, the 2D dam-break column of width 1.2
+and height 0.6 with the matching initial conditions is
+
+    column = WaterColumn((1.2, 0.6))
+    initialConditions = {'ncls': LevelSetIC(column),
+                         'vof': VOFIC(column, eps=1.5*he),
+                         'pressure': HydrostaticPressureIC(column, 0.6, L[1], rho_0, rho_1, g[1], axis=1)}
+
+The initial conditions have uOfXT_batch, so wrapping them with
+tools.initial_conditions.tabulate has proteus evaluate them in bulk.
+"""
+import math
+import numpy as np
+from .initial_conditions import smoothed_heaviside
+
+class Shape(object):
+    """
+    Signed distance function, negative inside: shape(x) at a point and
+    shape.batch(X) at the rows of X
+    """
+
+class HalfPlane(Shape):
+    """Points on the side of the plane through point opposite to normal (e.g. below a still water level)"""
+    def __init__(self, point, normal):
+        self.point = np.asarray(point, dtype='d')
+        self.normal = np.asarray(normal, dtype='d')/np.linalg.norm(normal)
+        self.nd = len(self.point)
+        self._terms = list(zip(range(self.nd), self.point.tolist(), self.normal.tolist()))
+
+    def __call__(self, x):
+        return sum((x[i] - p)*n for i, p, n in self._terms)
+
+    def batch(self, X):
+        return (np.asarray(X)[:,:self.nd] - self.point).dot(self.normal)
+
+class Box(Shape):
+    """
+    Axis-aligned box [lo, hi] in the coordinates axes (all by default).
+    Bounds may be infinite.
+    """
+    def __init__(self, lo, hi, axes=None):
+        self.lo = np.asarray(lo, dtype='d')
+        self.hi = np.asarray(hi, dtype='d')
+        self.axes = list(range(len(self.lo))) if axes is None else list(axes)
+        self._bounds = list(zip(self.axes, self.lo.tolist(), self.hi.tolist()))
+
+    def __call__(self, x):
+        d = [max(lo - x[i], x[i] - hi) for i, lo, hi in self._bounds]
+        inside = max(d)
+        if inside < 0.0:
+            return inside
+        return math.sqrt(sum(di*di for di in d if di > 0.0))
+
+    def batch(self, X):
+        x = np.asarray(X)[:,self.axes]
+        d = np.maximum(self.lo - x, x - self.hi)
+        inside = d.max(1)
+        return np.where(inside < 0.0, inside, np.sqrt((np.maximum(d, 0.0)**2).sum(1)))
+
+class WaterColumn(Box):
+    """
+    Dam-break water column filling everything below corner, e.g. (x, y) in 2D
+    or (x, z) in 3D with axes=(0, 2)
+    """
+    def __init__(self, corner, axes=None):
+        Box.__init__(self, [-np.inf]*len(corner), corner, axes)
+
+class Ball(Shape):
+    """Disk or sphere in the coordinates axes (all by default)"""
+    def __init__(self, center, radius, axes=None):
+        self.center = np.asarray(center, dtype='d')
+        self.radius = radius
+        self.axes = list(range(len(self.center))) if axes is None else list(axes)
+        self._center = list(zip(self.axes, self.center.tolist()))
+
+    def __call__(self, x):
+        return math.sqrt(sum((x[i] - c)**2 for i, c in self._center)) - self.radius
+
+    def batch(self, X):
+        return np.sqrt(((np.asarray(X)[:,self.axes] - self.center)**2).sum(1)) - self.radius
+
+class Union(Shape):
+    def __init__(self, *shapes):
+        self.shapes = shapes
+
+    def __call__(self, x):
+        return min(shape(x) for shape in self.shapes)
+
+    def batch(self, X):
+        return np.min([shape.batch(X) for shape in self.shapes], axis=0)
+
+class Intersection(Shape):
+    def __init__(self, *shapes):
+        self.shapes = shapes
+
+    def __call__(self, x):
+        return max(shape(x) for shape in self.shapes)
+
+    def batch(self, X):
+        return np.max([shape.batch(X) for shape in self.shapes], axis=0)
+
+class FreeSurface(Shape):
+    """
+    Flat free surface x[axis] = level, or regionLevel inside region.
+    Across the region boundary this is only the vertical distance.
+    """
+    def __init__(self, level, axis, region=None, regionLevel=None):
+        self.level = level
+        self.axis = axis
+        self.region = region
+        self.regionLevel = regionLevel
+
+    def __call__(self, x):
+        if self.region is not None and self.region(x) < 0.0:
+            return x[self.axis] - self.regionLevel
+        return x[self.axis] - self.level
+
+    def batch(self, X):
+        X = np.asarray(X)
+        level = self.level
+        if self.region is not None:
+            level = np.where(self.region.batch(X) < 0.0, self.regionLevel, self.level)
+        return X[:,self.axis] - level
+
+def _smoothed_heaviside(eps, phi):
+    """Scalar smoothed Heaviside, as in proteus.ctransportCoefficients"""
+    if phi > eps:
+        return 1.0
+    if phi < -eps:
+        return 0.0
+    if phi == 0.0:
+        return 0.5
+    return 0.5*(1.0 + phi/eps + math.sin(math.pi*phi/eps)/math.pi)
+
+def hydrostatic_pressure(z, phi, level, top, rho_0, rho_1, g):
+    """Air column from top down to level and water below it, by the sign of phi"""
+    g = abs(g)
+    return np.where(phi < 0.0, rho_1*g*(top - level) + rho_0*g*(level - z), rho_1*g*(top - z))
+
+class LevelSetIC(object):
+    def __init__(self, shape):
+        self.shape = shape
+
+    def uOfXT(self, x, t):
+        return self.shape(x)
+
+    def uOfXT_batch(self, X, t):
+        return self.shape.batch(X)
+
+class VOFIC(object):
+    """Air volume fraction, the smoothed Heaviside of the signed distance"""
+    def __init__(self, shape, eps):
+        self.shape = shape
+        self.eps = eps
+
+    def uOfXT(self, x, t):
+        return _smoothed_heaviside(self.eps, self.shape(x))
+
+    def uOfXT_batch(self, X, t):
+        return smoothed_heaviside(self.eps, self.shape.batch(X))
+
+class HydrostaticPressureIC(object):
+    """Hydrostatic pressure with the water level at level and the domain top at top"""
+    def __init__(self, shape, level, top, rho_0, rho_1, g, axis):
+        self.shape = shape
+        self.level = level
+        self.top = top
+        self.rho_0 = rho_0
+        self.rho_1 = rho_1
+        self.g = g
+        self.axis = axis
+
+    def uOfXT(self, x, t):
+        g = abs(self.g)
+        if self.shape(x) < 0.0:
+            return self.rho_1*g*(self.top - self.level) + self.rho_0*g*(self.level - x[self.axis])
+        return self.rho_1*g*(self.top - x[self.axis])
+
+    def uOfXT_batch(self, X, t):
+        return hydrostatic_pressure(np.asarray(X)[:,self.axis], self.shape.batch(X), self.level, self.top,
+                                    self.rho_0, self.rho_1, self.g)
@@ -0,0 +1,69 @@
+"""
+Uniform bin grid over element bounding boxes for point and segment location.
+
+Used by tools.gauges: by the post-hoc gauges on the saved mesh and, during
+the run, by BufferedPointGauges on the owned elements of each rank (reef
+and marin with buffered_gauges=True). proteus.Gauges locates its points
+inside the library and does not use it.
+"""
+import numpy as np
+
+class BinGrid(object):
+    """
+    Bins the bounding boxes of the elements of a simplex mesh.
+
+    The grid has about binsPerElement bins per element (element bounding
+    boxes are several times larger than the elements). Every element is
+    listed in each bin its bounding box overlaps, so a point only has to be
+    tested against the few elements in its bin.
+    """
+    def __init__(self, nodes, elements, binsPerElement=0.1):
+        X = np.asarray(nodes)[np.asarray(elements)]
+        self.nd = X.shape[2]
+        lo = X.min(1)
+        hi = X.max(1)
+        self.lo = lo.min(0)
+        self.hi = hi.max(0)
+        extent = np.maximum(self.hi - self.lo, 1.0e-300)
+        h = (extent.prod()/(binsPerElement*len(X)))**(1.0/self.nd)
+        self.shape = np.maximum(np.ceil(extent/h), 1).astype('i')
+        self.h = extent/self.shape
+        first = self.bin_index(lo)
+        last = self.bin_index(hi)
+        # expand each element over the block of bins first..last
+        counts = last - first + 1
+        n = counts.prod(1)
+        element = np.repeat(np.arange(len(X)), n)
+        offset = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        ijk = np.empty((len(element), self.nd), dtype='i')
+        for d in range(self.nd - 1, -1, -1):
+            c = counts[element, d]
+            ijk[:,d] = first[element, d] + offset % c
+            offset //= c
+        bins = np.ravel_multi_index(ijk.T, self.shape)
+        order = np.argsort(bins, kind='stable')
+        self.elements = element[order].astype('i')
+        self.offsets = np.searchsorted(bins[order], np.arange(self.shape.prod() + 1))
+
+    def bin_index(self, x):
+        """Integer (i, j[, k]) of the bins holding points x, clipped to the grid"""
+        return np.clip(np.floor((np.asarray(x) - self.lo)/self.h), 0, self.shape - 1).astype('i')
+
+    def candidates(self, x, tol=1.0e-10):
+        """(point index, element) pairs for every element sharing a bin with each point"""
+        x = np.atleast_2d(x)[:,:self.nd]
+        eps = tol*(self.hi - self.lo)
+        outside = np.any((x < self.lo - eps) | (x > self.hi + eps), axis=1)
+        bins = np.ravel_multi_index(self.bin_index(x).T, self.shape)
+        start = self.offsets[bins]
+        n = np.where(outside, 0, self.offsets[bins + 1] - start)
+        point = np.repeat(np.arange(len(x)), n)
+        return point, self.elements[np.repeat(start, n) + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)]
+
+    def box_candidates(self, lo, hi):
+        """Elements listed in any bin overlapped by the box [lo, hi]"""
+        first = self.bin_index(np.asarray(lo)[:self.nd])
+        last = self.bin_index(np.asarray(hi)[:self.nd])
+        block = np.meshgrid(*[np.arange(a, b + 1) for a, b in zip(first, last)], indexing='ij')
+        bins = np.ravel_multi_index([i.ravel() for i in block], self.shape)
+        return np.unique(np.concatenate([self.elements[self.offsets[b]:self.offsets[b + 1]] for b in bins]))
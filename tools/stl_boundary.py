@@ -0,0 +1,78 @@
+"""
+Boundary flags of triangulated (STL) surfaces, in whole-array operations.
+
+st.ShapeSTL reads the vertices and facets of an STL file but leaves the
+flags to the case. BoundaryClassifier holds rules that each select a set
+of facets and vertices:
+
+  - plane: on the minimum or maximum bounding-box plane along an axis
+  - normal: the facet normal within an angle of a direction
+  - predicate: a function of an (n, 3) array of points returning a boolean
+    array, applied to the vertices and to the facet centroids
+
+The flags come back as arrays ready for st.CustomShape. The first rule that
+selects an entity sets its flag, like an if/elif chain, and entities
+selected by no rule get the default:
+
+    SG = st.ShapeSTL(domain2, 'SG_full_2.stl')
+    classifier = BoundaryClassifier(SG.vertices, SG.facets)
+    classifier.plane(0, 'min', boundaryTags['left'])
+    classifier.normal([0., 0., 1.], boundaryTags['top'], angle=5.0)
+    classifier.predicate(lambda X: X[:, 0] > 10.0, boundaryTags['gate'])
+    vertexFlags, facetFlags = classifier.flags(default=boundaryTags['gate'])
+"""
+import numpy as np
+
+class BoundaryClassifier(object):
+    def __init__(self, vertices, facets):
+        self.vertices = np.asarray(vertices, dtype='d')
+        facets = np.asarray(facets)
+        # ShapeSTL facets are (nFacets, 1, 3): one loop of three vertices
+        self.triangles = facets.reshape(len(facets), -1)[:, :3].astype(np.int64)
+        self.lower = self.vertices.min(axis=0)
+        self.upper = self.vertices.max(axis=0)
+        self.rules = []
+
+    def add(self, vertexMask, facetMask, flag):
+        """Rule selecting the vertices and facets where the boolean masks are set"""
+        self.rules.append((np.asarray(vertexMask, dtype=bool), np.asarray(facetMask, dtype=bool), flag))
+
+    def plane(self, axis, side, flag, tol=0.0):
+        """Vertices within tol of the side ('min' or 'max') of the bounding box along axis, and facets with all three"""
+        bound = self.lower[axis] if side == 'min' else self.upper[axis]
+        onPlane = np.abs(self.vertices[:, axis] - bound) <= tol
+        self.add(onPlane, onPlane[self.triangles].all(axis=1), flag)
+
+    def normals(self):
+        """Unit normals of the facets, from their vertex order"""
+        X = self.vertices[self.triangles]
+        n = np.cross(X[:, 1] - X[:, 0], X[:, 2] - X[:, 0])
+        return n/np.maximum(np.linalg.norm(n, axis=1), 1e-300)[:, None]
+
+    def normal(self, direction, flag, angle=1.0, oriented=True):
+        """
+        Facets whose normal is within angle degrees of direction (of either
+        sign if not oriented), and their vertices
+        """
+        direction = np.asarray(direction, dtype='d')
+        cosine = self.normals().dot(direction/np.linalg.norm(direction))
+        if not oriented:
+            cosine = np.abs(cosine)
+        facetMask = cosine >= np.cos(np.radians(angle))
+        vertexMask = np.zeros(len(self.vertices), dtype=bool)
+        vertexMask[self.triangles[facetMask].ravel()] = True
+        self.add(vertexMask, facetMask, flag)
+
+    def predicate(self, function, flag):
+        """Vertices, and facets by their centroid, where function(points) is True"""
+        centroids = self.vertices[self.triangles].mean(axis=1)
+        self.add(function(self.vertices), function(centroids), flag)
+
+    def flags(self, default=0):
+        """vertexFlags and facetFlags, the first matching rule winning"""
+        vertexFlags = np.full(len(self.vertices), default, dtype=np.int64)
+        facetFlags = np.full(len(self.triangles), default, dtype=np.int64)
+        for vertexMask, facetMask, flag in reversed(self.rules):
+            vertexFlags[vertexMask] = flag
+            facetFlags[facetMask] = flag
+        return vertexFlags, facetFlags
@@ -0,0 +1,142 @@
+"""
+Wave kinematics evaluated once per point and time level.
+
+The velocity inlet, the generation zone and the initial conditions of a
+wave case all ask the WaveTools object for eta and u at the same points
+and times, each through separate wave.eta(x, t) and wave.u(x, t) calls.
+WaveKinematics wraps the wave so that eta and the velocity vector are
+computed together and cached per time level, and it can stand in for the
+wave wherever proteus expects one:
+
+    kinematics = WaveKinematics(wave)
+    tank.BC['x-'].setUnsteadyTwoPhaseVelocityInlet(kinematics, smoothing=smoothing, vert_axis=1)
+    tank.setGenerationZones(x_n=True, waves=kinematics, smoothing=smoothing, dragAlpha=dragAlpha)
+
+    eta, u = kinematics(x, t)
+
+Only the last maxTimes time levels are kept.
+
+A monochromatic wave (Linear or Fenton with Nf modes) is periodic in time,
+so at a fixed point eta and u are trigonometric polynomials of degree Nf in
+omega*t. PeriodicWaveKinematics samples the wave 2*Nf+1 times per point
+over one period to get the coefficients of these polynomials, once per
+point, after which each time level is a small matrix-vector product with
+[1, cos(n*omega*t), sin(n*omega*t)] instead of new cosh/cos evaluations:
+
+    kinematics = PeriodicWaveKinematics(wave, wave_period, Nf)
+
+Tables are keyed by the point coordinates, and the least recently used
+ones are dropped beyond maxPoints. A new point costs 2*Nf+1 evaluations of
+the wave, so the tables only pay off on a fixed mesh such as wave_tank's;
+moving-mesh cases, where the boundary nodes keep moving, use
+WaveKinematics. batch(X, t, points) keeps the tables of the point set named
+points and rebuilds them all when the points change.
+"""
+from collections import OrderedDict
+import numpy as np
+
+class WaveKinematics(object):
+    def __init__(self, wave, maxTimes=4):
+        self.wave = wave
+        self.maxTimes = maxTimes
+        self.levels = OrderedDict()
+
+    def __getattr__(self, name):
+        # mwl, wavelength, ... of the wrapped wave
+        if name == 'wave':
+            raise AttributeError(name)
+        return getattr(self.wave, name)
+
+    def clear(self, tables=True):
+        """Forget the cached time levels, and with tables the per-point tables of subclasses"""
+        self.levels.clear()
+
+    def _level(self, t):
+        """Cache of the points of the time level t"""
+        level = self.levels.get(t)
+        if level is None:
+            level = self.levels[t] = {}
+            while len(self.levels) > self.maxTimes:
+                self.levels.popitem(last=False)
+        return level
+
+    def __call__(self, x, t):
+        """eta and the velocity vector at the point x at time t"""
+        points = self._level(t)
+        key = (float(x[0]), float(x[1]), float(x[2]))
+        try:
+            return points[key]
+        except KeyError:
+            value = points[key] = self._evaluate(x, t)
+            return value
+
+    def _evaluate(self, x, t):
+        return self.wave.eta(x, t), self.wave.u(x, t)
+
+    def eta(self, x, t):
+        return self(x, t)[0]
+
+    def u(self, x, t):
+        return self(x, t)[1]
+
+class PeriodicWaveKinematics(WaveKinematics):
+    def __init__(self, wave, period, nHarmonics, maxTimes=4, maxPoints=100000):
+        WaveKinematics.__init__(self, wave, maxTimes)
+        self.period = period
+        self.omega = 2*np.pi/period
+        self.nHarmonics = nHarmonics
+        self.maxPoints = maxPoints
+        # eta, u, v, w sampled at nSamples phases give the coefficients exactly
+        self.nSamples = 2*nHarmonics + 1
+        self.sampleTimes = period*np.arange(self.nSamples)/self.nSamples
+        self.solve = np.linalg.inv(self.harmonics(self.sampleTimes))
+        self.tables = OrderedDict()
+        self.pointSets = {}
+        self.t = None
+
+    def clear(self, tables=True):
+        WaveKinematics.clear(self)
+        if tables:
+            self.tables.clear()
+            self.pointSets.clear()
+            self.t = None
+
+    def harmonics(self, t):
+        """[1, cos(n*omega*t), sin(n*omega*t)] for n = 1..nHarmonics"""
+        phase = np.multiply.outer(np.atleast_1d(t), self.omega*np.arange(1, self.nHarmonics + 1))
+        return np.hstack([np.ones((len(phase), 1)), np.cos(phase), np.sin(phase)]).squeeze()
+
+    def sample(self, x):
+        """(4, nSamples) coefficients of eta, u, v, w at the point x"""
+        values = np.empty((self.nSamples, 4))
+        for j, t in enumerate(self.sampleTimes):
+            values[j, 0] = self.wave.eta(x, t)
+            values[j, 1:] = self.wave.u(x, t)
+        return self.solve.dot(values).T
+
+    def table(self, x):
+        key = (float(x[0]), float(x[1]), float(x[2]))
+        try:
+            self.tables.move_to_end(key)
+            return self.tables[key]
+        except KeyError:
+            if len(self.tables) >= self.maxPoints:
+                self.tables.popitem(last=False)
+            value = self.tables[key] = self.sample(x)
+            return value
+
+    def _evaluate(self, x, t):
+        if t != self.t:
+            self.t = t
+            self.h = self.harmonics(t)
+        values = self.table(x).dot(self.h)
+        return values[0], values[1:]
+
+    def batch(self, X, t, points='nodes'):
+        """eta (n,) and velocities (n, 3) at the points X[:, :3] at time t"""
+        X = np.array(X, dtype='d').reshape(-1, 3)
+        stored = self.pointSets.get(points)
+        if stored is None or stored[0].shape != X.shape or np.any(stored[0] != X):
+            stored = self.pointSets[points] = (X, np.array([self.sample(x) for x in X]).reshape(-1, 4, self.nSamples))
+        values = stored[1].dot(self.harmonics(t))
+        return values[:, 0], values[:, 1:]
@@ -0,0 +1,414 @@
+"""
+Random-wave kinematics synthesised by inverse FFT.
+
+wt.RandomWavesFast rebuilds the linear sea of wt.RandomWaves from
+overlapping windows, and the inlet and the generation zone evaluate all the
+components of a window at every point and time step. With the equispaced
+frequencies f_i of RandomWaves, a quantity at a fixed point is
+
+    q(t) = exp(-2*pi*1j*fc*t) * sum_i c_i exp(-2*pi*1j*(f_i - fc)*t)
+
+and the sum is a DFT on the time grid t = j/(M*df). The phases only depend
+on the horizontal position, so SpectralWaveKinematics computes, for each
+horizontal position, eta and the horizontal and vertical velocities at
+nLevels levels from the bottom to mwl + Hs with one FFT each, keeps window
+samples of them and interpolates in time and over the levels. A time step
+costs a 4-point interpolation per point whatever the number of components,
+and all the nodes of a vertical inlet share one table:
+
+    components = wt.RandomWaves(Tp=Tp, Hs=Hs, mwl=mwl, depth=depth, waveDir=waveDir, g=g, N=N,
+                                bandFactor=bandFactor, spectName=spectName,
+                                spectral_params=spectral_params, phi=phi)
+    kinematics = SpectralWaveKinematics(components)
+    tank.BC['x-'].setUnsteadyTwoPhaseVelocityInlet(kinematics, smoothing=smoothing, vert_axis=1)
+
+samplesPerPeriod sets the time grid against the band around fc and
+levelSpacing the levels against the shortest wave; the interpolation error
+of eta and both velocities against the direct sum is checked over the depth
+at construction with checkAcc, as RandomWavesFast does for its windows.
+Points above the top level take its velocities. compare() measures the
+error against another evaluation of the sea, e.g. RandomWaves itself, as
+synthesis_benchmark.py of the overtopping case does.
+
+A table takes (window + 3)*(1 + 2*nLevels)*16 bytes, about 45 KB for the
+defaults and 5 levels, and the least recently used ones are dropped beyond
+maxBytes. A generation zone spread over more horizontal positions than
+that keeps rebuilding them: raise maxBytes, or lower window, which saves
+memory at the cost of more frequent FFTs.
+
+The components only depend on the sea state, so sweeps over the structure
+can share them through an on-disk cache that every rank memory-maps. The
+cache calls the wave class with the keyword arguments and keys on all of
+them:
+
+    components = cached_sea_state(wt.RandomWaves, Tp=Tp, Hs=Hs, ..., phi=phi)
+
+The expensive part of wt.RandomWavesFast is the decomposition of its
+windows. cached_wave builds the wave once on the master, keyed on every
+constructor argument the same way, and stores its state: the arrays (the
+window decompositions) as .npy files that every rank memory-maps, the rest
+as JSON. Only classes and functions of the wave's own module are rebuilt
+from it; a wave holding anything else is not cached but built on every
+rank:
+
+    wave = cached_wave(wt.RandomWavesFast, Tstart=Tstart, Tend=Tend, x0=x0, ..., fast=True)
+
+Clear cacheDir after updating WaveTools.
+"""
+import hashlib
+import json
+import inspect
+import os
+import shutil
+import sys
+from collections import OrderedDict
+import numpy as np
+from .wave_kinematics import WaveKinematics
+
+def _lagrange_weights(u):
+    """Cubic Lagrange weights of the samples -1, 0, 1, 2 at 0 <= u < 1"""
+    return np.array([-u*(u - 1.0)*(u - 2.0)/6.0,
+                     (u + 1.0)*(u - 1.0)*(u - 2.0)/2.0,
+                     -(u + 1.0)*u*(u - 2.0)/2.0,
+                     (u + 1.0)*u*(u - 1.0)/6.0])
+
+class SpectralWaveKinematics(WaveKinematics):
+    def __init__(self, wave, samplesPerPeriod=16, window=256, checkAcc=True, tol=1e-3,
+                 maxTimes=4, levelSpacing=0.5, maxBytes=256*2**20):
+        WaveKinematics.__init__(self, wave, maxTimes)
+        fi = np.asarray(wave.fi, dtype='d')
+        df = (fi[-1] - fi[0])/(len(fi) - 1)
+        if not np.allclose(np.diff(fi), df, rtol=1e-6, atol=0.0):
+            raise ValueError("spectral synthesis needs equispaced frequencies")
+        self.ai = np.asarray(wave.ai, dtype='d')
+        self.phi = np.asarray(wave.phi, dtype='d')
+        self.ki = np.asarray(wave.ki, dtype='d')
+        self.kDir = np.asarray(wave.kDir, dtype='d')
+        self.omega = 2*np.pi*fi
+        self.mwl = wave.mwl
+        self.depth = wave.depth
+        self.waveDir = np.asarray(wave.waveDir, dtype='d')
+        self.vDir = np.asarray(wave.vDir, dtype='d')
+        self.fc = fi[len(fi)//2]
+        offsets = np.rint((fi - self.fc)/df).astype(int)
+        bandwidth = np.abs(offsets).max()*df
+        self.M = 1 << int(np.ceil(np.log2(max(samplesPerPeriod*bandwidth/df, 2*len(fi)))))
+        self.dt = 1.0/(self.M*df)
+        self.slots = offsets % self.M
+        self.window = window
+        # velocity levels from the bottom to mwl + Hs, levelSpacing/k of the shortest wave apart
+        bottom = self.mwl - self.depth
+        top = self.mwl + 4.0*np.sqrt((self.ai**2).sum()/2.0)
+        self.nLevels = max(4, int(np.ceil((top - bottom)*self.ki.max()/levelSpacing)) + 1)
+        self.zLevels = np.linspace(bottom, top, self.nLevels)
+        self.dz = self.zLevels[1] - self.zLevels[0]
+        self.maxPositions = max(1, maxBytes//((window + 3)*(1 + 2*self.nLevels)*16))
+        self.tables = OrderedDict()
+        self.pointSets = {}
+        self.t = None
+        if checkAcc:
+            self.check(tol)
+
+    def clear(self, tables=True):
+        WaveKinematics.clear(self)
+        if tables:
+            self.tables.clear()
+            self.pointSets.clear()
+            self.t = None
+
+    def spectra(self, X):
+        """(n, 3, N) complex amplitudes of eta, horizontal and vertical velocity"""
+        X = np.asarray(X, dtype='d').reshape(-1, 3)
+        ce = self.ai*np.exp(1j*(X.dot(self.kDir.T) + self.phi))
+        Z = X.dot(self.vDir) - self.mwl
+        # cosh(k(Z+h))/sinh(kh) and sinh(k(Z+h))/sinh(kh) without overflow
+        kz = np.multiply.outer(Z, self.ki)
+        decay = np.exp(-2*self.ki*self.depth)
+        up = np.exp(kz)/(1.0 - decay)
+        down = np.exp(-kz)*decay/(1.0 - decay)
+        velocity = ce*self.omega
+        return np.stack([ce, velocity*(up + down), velocity*(up - down)], axis=1)
+
+    def horizontal(self, X):
+        """The points X moved to the vertical coordinate 0, where their tables are keyed"""
+        X = np.asarray(X, dtype='d').reshape(-1, 3)
+        return X - np.outer(X.dot(self.vDir), self.vDir)
+
+    def series(self, H, j0, chunk=16):
+        """
+        (n, window + 3, 1 + 2*nLevels) samples j0, j0+1, ... of the envelopes
+        at the horizontal positions H: eta, then the horizontal and the
+        vertical velocity at zLevels
+        """
+        H = np.asarray(H, dtype='d').reshape(-1, 3)
+        rows = np.arange(j0, j0 + self.window + 3) % self.M
+        samples = np.empty((len(H), len(rows), 1 + 2*self.nLevels), dtype=complex)
+        for i in range(0, len(H), chunk):
+            X = (H[i:i + chunk, None, :] + np.multiply.outer(self.zLevels, self.vDir)).reshape(-1, 3)
+            spectra = self.spectra(X).reshape(-1, self.nLevels, 3, len(self.ai))
+            envelopes = np.concatenate([spectra[:, :1, 0], spectra[:, :, 1], spectra[:, :, 2]], axis=1)
+            dense = np.zeros(envelopes.shape[:2] + (self.M,), dtype=complex)
+            dense[:, :, self.slots] = envelopes
+            samples[i:i + chunk] = np.fft.fft(dense, axis=2)[:, :, rows].transpose(0, 2, 1)
+        return samples
+
+    def _time(self, t):
+        """First sample, interpolation weights and carrier at time t"""
+        s = t/self.dt
+        j = int(np.floor(s))
+        return j - 1, _lagrange_weights(s - j), np.exp(-2j*np.pi*self.fc*t)
+
+    def _depth(self, z):
+        """First level and interpolation weights at the vertical coordinates z, clipped to zLevels"""
+        s = (np.clip(z, self.zLevels[0], self.zLevels[-1]) - self.zLevels[0])/self.dz
+        i = np.clip(np.floor(s).astype(int), 1, self.nLevels - 3)
+        return i - 1, _lagrange_weights(s - i)
+
+    def table(self, x, t):
+        key = tuple(self.horizontal(x)[0].tolist())
+        start = int(np.floor(t/self.dt)) - 1
+        stored = self.tables.get(key)
+        if stored is None or not 0 <= start - stored[0] < self.window:
+            if stored is None and len(self.tables) >= self.maxPositions:
+                # least recently used first
+                self.tables.popitem(last=False)
+            stored = self.tables[key] = (start, self.series(np.array(key), start)[0])
+        else:
+            self.tables.move_to_end(key)
+        return stored
+
+    def _evaluate(self, x, t):
+        j0, table = self.table(x, t)
+        if t != self.t:
+            self.t = t
+            self.time = self._time(t)
+        start, weights, carrier = self.time
+        values = weights.dot(table[start - j0:start - j0 + 4])*carrier
+        i, w = self._depth(np.dot(x[:3], self.vDir))
+        uh = w.dot(values[1 + i:5 + i]).real
+        uv = w.dot(values[1 + self.nLevels + i:5 + self.nLevels + i]).imag
+        return values[0].real, uh*self.waveDir + uv*self.vDir
+
+    def batch(self, X, t, points='nodes'):
+        """eta (n,) and velocities (n, 3) at the points X[:, :3] at time t"""
+        X = np.array(X, dtype='d').reshape(-1, 3)
+        start, weights, carrier = self._time(t)
+        stored = self.pointSets.get(points)
+        if (stored is None or stored[1].shape != X.shape or np.any(stored[1] != X)
+                or not 0 <= start - stored[0] < self.window):
+            H, position = np.unique(self.horizontal(X), axis=0, return_inverse=True)
+            i, w = self._depth(X.dot(self.vDir))
+            stored = self.pointSets[points] = (start, X, position.ravel(), self.series(H, start), i, w.T)
+        j0, _, position, tables, i, w = stored
+        values = np.einsum('k,pkq->pq', weights, tables[:, start - j0:start - j0 + 4])[position]*carrier
+        levels = i[:, None] + np.arange(4)
+        uh = (w*np.take_along_axis(values, 1 + levels, 1)).sum(1).real
+        uv = (w*np.take_along_axis(values, 1 + self.nLevels + levels, 1)).sum(1).imag
+        return values[:, 0].real, np.outer(uh, self.waveDir) + np.outer(uv, self.vDir)
+
+    def check(self, tol, nTimes=200, nDepths=7):
+        """
+        Raise ValueError if eta or the velocities differ from the direct sum
+        of the components by more than tol of their range, at nDepths points
+        from the top level down to near the bottom, between the levels
+        """
+        Z = np.linspace(self.zLevels[-1], self.zLevels[0] + 0.1*self.depth, nDepths) - 0.37*self.dz
+        X = np.outer(np.maximum(Z, self.zLevels[0]), self.vDir)
+        times = np.linspace(0.0, self.M*self.dt, nTimes, endpoint=False) + 0.37*self.dt
+        synthesised = np.empty((nTimes, nDepths, 3))
+        for i, t in enumerate(times):
+            eta, U = self.batch(X, t, points='check')
+            synthesised[i] = np.column_stack([eta, U.dot(self.waveDir), U.dot(self.vDir)])
+        self.pointSets.pop('check', None)
+        sums = np.einsum('nqk,tk->tnq', self.spectra(X), np.exp(-1j*np.outer(times, self.omega)))
+        direct = np.stack([sums[..., 0].real, sums[..., 1].real, sums[..., 2].imag], axis=-1)
+        error = max(np.abs(synthesised[..., q] - direct[..., q]).max()/max(np.ptp(direct[..., q]), 1e-300)
+                    for q in range(3))
+        if error > tol:
+            raise ValueError("spectral synthesis error {0:.2e} above {1:.0e}, increase samplesPerPeriod "
+                             "or decrease levelSpacing".format(error, tol))
+        return error
+
+    def compare(self, reference, X, times):
+        """
+        Largest differences of eta and of the velocity from reference.eta and
+        reference.u (e.g. the RandomWaves or RandomWavesFast of the same sea)
+        at the points X, relative to the range of the reference values
+        """
+        X = np.asarray(X, dtype='d').reshape(-1, 3)
+        values = [self.batch(X, t, points='compare') for t in times]
+        self.pointSets.pop('compare', None)
+        eta = np.array([v[0] for v in values])
+        U = np.array([v[1] for v in values])
+        etaReference = np.array([[reference.eta(x, t) for x in X] for t in times])
+        UReference = np.array([[reference.u(x, t) for x in X] for t in times])
+        return (np.abs(eta - etaReference).max()/max(np.ptp(etaReference), 1e-300),
+                np.abs(U - UReference).max()/max(np.ptp(UReference), 1e-300))
+
+class SeaState(object):
+    """The components of a linear random sea read by SpectralWaveKinematics"""
+    arrays = ('fi', 'ai', 'phi', 'ki', 'kDir', 'waveDir', 'vDir')
+    scalars = ('mwl', 'depth', 'wavelength')
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+def _cache_key(waveClass, arguments):
+    key = dict(arguments, waveClass=waveClass.__name__)
+    return hashlib.sha1(json.dumps(key, sort_keys=True, default=lambda a: np.asarray(a).tolist()).encode()).hexdigest()
+
+def cached_sea_state(waveClass, cacheDir='wave_cache', **arguments):
+    """
+    SeaState of waveClass(**arguments) from cacheDir, keyed by the class and
+    the arguments, with memory-mapped arrays; the wave is only built on a
+    cache miss
+    """
+    path = os.path.join(cacheDir, _cache_key(waveClass, arguments))
+    if not os.path.isdir(path):
+        wave = waveClass(**arguments)
+        tmp = path + '.%d.tmp' % os.getpid()
+        os.makedirs(tmp, exist_ok=True)
+        for name in SeaState.arrays:
+            np.save(os.path.join(tmp, name + '.npy'), np.asarray(getattr(wave, name), dtype='d'))
+        with open(os.path.join(tmp, 'scalars.json'), 'w') as f:
+            json.dump(dict((name, float(getattr(wave, name))) for name in SeaState.scalars), f)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # another process stored the same sea state first
+            for name in os.listdir(tmp):
+                os.remove(os.path.join(tmp, name))
+            os.rmdir(tmp)
+    with open(os.path.join(path, 'scalars.json')) as f:
+        attributes = json.load(f)
+    for name in SeaState.arrays:
+        attributes[name] = np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+    return SeaState(**attributes)
+
+def _describe(value, module, arrays, ids):
+    """JSON description of value, its arrays appended to arrays"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (np.ndarray, memoryview)) or type(value).__name__ == '_memoryviewslice':
+        array = np.asarray(value)
+        if array.dtype.kind not in 'biufc':
+            raise TypeError("cannot store {0} arrays".format(array.dtype))
+        arrays.append(array)
+        return {'array': len(arrays) - 1}
+    if isinstance(value, (list, tuple)):
+        return {type(value).__name__: [_describe(v, module, arrays, ids) for v in value]}
+    if isinstance(value, dict) and all(isinstance(key, str) for key in value):
+        return {'dict': dict((key, _describe(v, module, arrays, ids)) for key, v in value.items())}
+    if inspect.ismethod(value):
+        return {'method': [value.__name__, _describe(value.__self__, module, arrays, ids)]}
+    if getattr(value, '__module__', None) == module and getattr(sys.modules[module], getattr(value, '__name__', ''), None) is value:
+        return {'function': value.__name__}
+    if type(value).__module__ == module and hasattr(value, '__dict__'):
+        if id(value) in ids:
+            return {'ref': ids[id(value)]}
+        ids[id(value)] = len(ids)
+        return {'object': [type(value).__name__, ids[id(value)], _describe(vars(value), module, arrays, ids)]}
+    raise TypeError("cannot store {0}".format(type(value).__name__))
+
+def _restore(description, module, arrays, objects):
+    """The value described by _describe, with arrays[i] for the arrays"""
+    if not isinstance(description, dict):
+        return description
+    (kind, content), = description.items()
+    if kind == 'array':
+        return arrays[content]
+    if kind in ('list', 'tuple'):
+        values = [_restore(v, module, arrays, objects) for v in content]
+        return values if kind == 'list' else tuple(values)
+    if kind == 'dict':
+        return dict((key, _restore(v, module, arrays, objects)) for key, v in content.items())
+    if kind == 'method':
+        return getattr(_restore(content[1], module, arrays, objects), content[0])
+    if kind == 'function':
+        return getattr(sys.modules[module], content)
+    if kind == 'ref':
+        return objects[content]
+    name, index, state = content
+    cls = getattr(sys.modules[module], name)
+    objects[index] = cls.__new__(cls)
+    objects[index].__dict__.update(_restore(state, module, arrays, objects))
+    return objects[index]
+
+def _store_wave(wave, path):
+    """Write the state of wave to the directory path, through a temporary directory"""
+    arrays = []
+    state = _describe(wave, type(wave).__module__, arrays, {})
+    tmp = path + '.%d.tmp' % os.getpid()
+    os.makedirs(tmp, exist_ok=True)
+    for i, array in enumerate(arrays):
+        np.save(os.path.join(tmp, '%d.npy' % i), array)
+    with open(os.path.join(tmp, 'state.json'), 'w') as f:
+        json.dump({'nArrays': len(arrays), 'state': state}, f)
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # another job stored the same wave first
+        shutil.rmtree(tmp)
+
+def _load_wave(waveClass, path):
+    """The wave stored at path, its arrays memory-mapped copy-on-write"""
+    with open(os.path.join(path, 'state.json')) as f:
+        stored = json.load(f)
+    arrays = []
+    for i in range(stored['nArrays']):
+        fileName = os.path.join(path, '%d.npy' % i)
+        try:
+            arrays.append(np.load(fileName, mmap_mode='c'))
+        except ValueError:
+            # empty arrays cannot be mapped
+            arrays.append(np.load(fileName))
+    return _restore(stored['state'], waveClass.__module__, arrays, {})
+
+def cached_wave(waveClass, cacheDir='wave_cache', comm=None, log=print, **arguments):
+    """
+    waveClass(**arguments) from cacheDir keyed by the class and the
+    arguments, the master building and storing it on a miss; built on every
+    rank instead if its state cannot be stored or read back
+    """
+    if comm is None:
+        from proteus import Comm
+        comm = Comm.get()
+    path = os.path.join(cacheDir, _cache_key(waveClass, arguments))
+    wave = None
+    if comm.isMaster() and not os.path.isdir(path):
+        wave = waveClass(**arguments)
+        try:
+            _store_wave(wave, path)
+        except TypeError as error:
+            log("not caching {0}: {1}".format(waveClass.__name__, error))
+    comm.barrier()
+    if wave is not None:
+        return wave
+    if os.path.isdir(path):
+        try:
+            return _load_wave(waveClass, path)
+        except (AttributeError, KeyError, ValueError, IOError) as error:
+            # stored by another version of WaveTools
+            log("rebuilding {0}: {1}".format(waveClass.__name__, error))
+    return waveClass(**arguments)
+
+def benchmark_synthesis(wave, kinematics, X, times):
+    """Time direct wave.eta/u against kinematics.batch at the points X"""
+    import time
+    X = np.asarray(X, dtype='d').reshape(-1, 3)
+    start = time.time()
+    direct = [(np.array([wave.eta(x, t) for x in X]), np.array([wave.u(x, t) for x in X])) for t in times]
+    directTime = time.time() - start
+    start = time.time()
+    synthesised = [kinematics.batch(X, t) for t in times]
+    synthesisTime = time.time() - start
+    etaError = max(np.abs(a[0] - b[0]).max() for a, b in zip(direct, synthesised))
+    uError = max(np.abs(a[1] - b[1]).max() for a, b in zip(direct, synthesised))
+    nEval = len(X)*len(times)
+    print("{0} points x {1} times".format(len(X), len(times)))
+    print("direct:      {0:.3f} s ({1:.1f} points/ms)".format(directTime, nEval/directTime/1000.0))
+    print("synthesised: {0:.3f} s ({1:.1f} points/ms)".format(synthesisTime, nEval/synthesisTime/1000.0))
+    print("max |eta| error {0:.3e}, max |u| error {1:.3e}".format(etaError, uError))
+    return directTime, synthesisTime, etaError, uError
@@ -0,0 +1,188 @@
+"""
+Throughput and accuracy of the WaveTools classes, with the parameters of
+the notebooks in this directory.
+
+Each wave is timed at a single point over a few time levels, over an array
+of points at one time level, and over a long time series at one point.
+Rates are evaluations per second of eta and u; where a reference exists
+(RandomWaves for RandomWavesFast, the direct TimeSeries reconstruction for
+the windowed one, the wave itself for the tabulated kinematics of tools/),
+the long series also reports the largest error relative to the reference
+range. Results go to a JSON file, and a baseline from an earlier proteus
+can be compared against:
+
+    python benchmark.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+import proteus
+from proteus import WaveTools as WT
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tools.wave_kinematics import PeriodicWaveKinematics
+from tools.wave_synthesis import SpectralWaveKinematics
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+class Case(object):
+    def __init__(self, name, wave, period, mwl, depth, vertical, reference=None, length=5.0):
+        self.name = name
+        self.wave = wave
+        self.period = period
+        self.mwl = mwl
+        self.depth = depth
+        self.vertical = vertical
+        self.reference = reference
+        self.length = length
+
+    def points(self, n, seed=0):
+        """n points in the water along x over length"""
+        random = np.random.RandomState(seed)
+        X = np.zeros((n, 3))
+        X[:, 0] = self.length*random.rand(n)
+        X[:, self.vertical] = self.mwl - self.depth*random.rand(n)
+        return X
+
+def cases():
+    """The waves of the notebooks, each built once"""
+    g2 = np.array([0., -9.81, 0.])
+    g3 = np.array([0., 0., -9.81])
+    x = np.array([1., 0., 0.])
+    yield Case('MonochromaticWaves(Linear)',
+               WT.MonochromaticWaves(period=0.87, waveHeight=0.05, mwl=0.515, depth=0.515, g=g2,
+                                     waveDir=x, waveType='Linear'), 0.87, 0.515, 0.515, 1)
+    fenton = WT.MonochromaticWaves(period=0.87, waveHeight=0.05, mwl=0.515, depth=0.515, g=g2,
+                                   waveDir=x, waveType='Fenton', Nf=8)
+    yield Case('MonochromaticWaves(Fenton)', fenton, 0.87, 0.515, 0.515, 1)
+    yield Case('PeriodicWaveKinematics(Fenton)', PeriodicWaveKinematics(fenton, 0.87, 8),
+               0.87, 0.515, 0.515, 1, reference=fenton)
+    yield Case('SolitaryWave',
+               WT.SolitaryWave(waveHeight=0.28, mwl=1.0, depth=1.0, g=g2, waveDir=x,
+                               trans=np.array([10., 0., 0.]), fast=False), 2.0, 1.0, 1.0, 1)
+    # RandomWavesFast.ipynb
+    Tp, Hs, mwl, depth, N = 2., 0.05, 1., 1., 500
+    phi = 2.0*np.pi*np.random.RandomState(0).rand(N)
+    random = WT.RandomWaves(Tp, Hs, mwl, depth, x, g2, N, 2., "JONSWAP", None, phi)
+    yield Case('RandomWaves', random, Tp, mwl, depth, 1)
+    yield Case('RandomWavesFast',
+               WT.RandomWavesFast(0., 80*Tp, np.zeros(3), Tp, Hs, mwl, depth, x, g2, N, 2., "JONSWAP",
+                                  None, phi, Lgen=np.zeros(3), Nfreq=16, Nwaves=8, checkAcc=False),
+               Tp, mwl, depth, 1, reference=random)
+    yield Case('SpectralWaveKinematics', SpectralWaveKinematics(random), Tp, mwl, depth, 1, reference=random)
+    yield Case('NewWave',
+               WT.NewWave(Tp=Tp, Hs=Hs, mwl=mwl, depth=depth, waveDir=x, g=g2, N=N, bandFactor=2.,
+                          spectName="JONSWAP", spectral_params=None, crestFocus=True,
+                          xfocus=np.zeros(3), tfocus=10., fast=True, Nmax=N), Tp, mwl, depth, 1)
+    # TimeSeries.ipynb
+    timeSeriesFile = os.path.join(here, "test_timeSeries.txt")
+    direct = WT.TimeSeries(timeSeriesFile, 0, np.zeros(3), 7., 48, 0., x, g3,
+                           cutoffTotal=0.02, rec_direct=True, window_params=None)
+    yield Case('TimeSeries(direct)', direct, 8., 0., 7., 2)
+    yield Case('TimeSeries(windows)',
+               WT.TimeSeries(timeSeriesFile, 0, np.zeros(3), 7., 48, 0., x, g3,
+                             cutoffTotal=0.02, rec_direct=False,
+                             window_params={"Nwaves": 3, "Tm": 8., "Window": "costap"}),
+               8., 0., 7., 2, reference=direct)
+    # DirectionalWaves.ipynb and MultiSpectraWaves.ipynb
+    yield Case('DirectionalWaves',
+               WT.DirectionalWaves(51, 2., 0.1, 0., 1., np.array([1., 1., 0.]), g3, 11, 1.5, "JONSWAP",
+                                   "cos2s", None, {"s": 15}, None, False), 2., 0., 1., 2)
+    yield Case('MultiSpectraRandomWaves',
+               WT.MultiSpectraRandomWaves(2, [2., 2.], [0.15, 0.3], 0., 1., [[1., 1., 0.], [-1, 1., 0.]], g3,
+                                          [101, 101], [2, 2], ["JONSWAP", "JONSWAP"], [None, None],
+                                          [None, None]), 2., 0., 1., 2)
+
+def timed(function, wave=None, tables=False):
+    if hasattr(wave, 'clear'):
+        # no help from the time levels cached by the previous measurement;
+        # the per-point tables are only rebuilt when timing their setup
+        wave.clear(tables)
+    start = time.perf_counter()
+    values = function()
+    return values, time.perf_counter() - start
+
+def result(case, mode, quantity, evaluations, seconds, error=None):
+    return {'wave': case.name, 'mode': mode, 'quantity': quantity, 'evaluations': evaluations,
+            'seconds': seconds, 'rate': evaluations/seconds, 'error': error}
+
+def run_case(case, nPoints=1000, nTimes=100, periods=80, perPeriod=25):
+    wave = case.wave
+    results = []
+    X = case.points(nPoints)
+    x = X[0]
+    if hasattr(wave, 'batch'):
+        # tables of the tabulated kinematics, built once per point set
+        _, seconds = timed(lambda: wave.batch(X, 0.0), wave, tables=True)
+        results.append(result(case, 'array', 'setup', nPoints, seconds))
+        _, seconds = timed(lambda: [wave(xi, 0.0) for xi in X], wave, tables=True)
+        results.append(result(case, 'point', 'setup', nPoints, seconds))
+    times = case.period*np.arange(nTimes)/perPeriod
+    for quantity in ('eta', 'u'):
+        f = getattr(wave, quantity)
+        _, seconds = timed(lambda: [f(x, t) for t in times], wave)
+        results.append(result(case, 'point', quantity, nTimes, seconds))
+    t = 0.3*case.period
+    for quantity in ('eta', 'u'):
+        f = getattr(wave, quantity)
+        _, seconds = timed(lambda: [f(xi, t) for xi in X], wave)
+        results.append(result(case, 'array', quantity, nPoints, seconds))
+    if hasattr(wave, 'batch'):
+        _, seconds = timed(lambda: wave.batch(X, t), wave)
+        results.append(result(case, 'array', 'batch', nPoints, seconds))
+    series = case.period*np.arange(periods*perPeriod)/perPeriod
+    eta, seconds = timed(lambda: np.array([wave.eta(x, t) for t in series]), wave)
+    error = None
+    if case.reference is not None:
+        exact = np.array([case.reference.eta(x, t) for t in series])
+        error = float(np.abs(eta - exact).max()/max(np.ptp(exact), 1e-300))
+    results.append(result(case, 'series', 'eta', len(series), seconds, error))
+    return results
+
+def compare(results, baseline, slowdown=0.2):
+    """Print rate ratios against baseline, return the entries that got slower or less accurate"""
+    old = dict(((r['wave'], r['mode'], r['quantity']), r) for r in baseline['results'])
+    regressions = []
+    for r in results:
+        b = old.get((r['wave'], r['mode'], r['quantity']))
+        if b is None:
+            continue
+        ratio = r['rate']/b['rate']
+        worse = ratio < 1.0/(1.0 + slowdown) or (
+            r['error'] is not None and b['error'] is not None and r['error'] > 2*b['error'] + 1e-12)
+        print("{0:32s} {1:6s} {2:5s} {3:6.2f}x{4}".format(r['wave'], r['mode'], r['quantity'], ratio,
+                                                          '  REGRESSION' if worse else ''))
+        if worse:
+            regressions.append(r)
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--output', default='wavetools_benchmark.json')
+    parser.add_argument('--compare', help='earlier results to compare the rates with')
+    parser.add_argument('--only', help='comma-separated wave names')
+    parser.add_argument('--points', type=int, default=1000)
+    args = parser.parse_args()
+    only = args.only.split(',') if args.only else None
+    results = []
+    for case in cases():
+        if only and case.name not in only:
+            continue
+        for r in run_case(case, nPoints=args.points):
+            print("{wave:32s} {mode:6s} {quantity:5s} {rate:12.1f} /s".format(**r) +
+                  ("  error {0:.2e}".format(r['error']) if r['error'] is not None else ''))
+            results.append(r)
+    report = {'proteus': getattr(proteus, '__version__', 'unknown'),
+              'python': platform.python_version(),
+              'numpy': np.__version__,
+              'platform': platform.platform(),
+              'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+              'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            sys.exit(1 if compare(results, json.load(f)) else 0)